@@ -12,7 +12,9 @@ DaRE (Data Removal-Enabled) Trees.
   * [Adding] After adding a sample, a non max-depth leaf node
     can turn into a decision node.
 """
+import os
 import numbers
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 
@@ -56,6 +58,8 @@ class Forest(object):
         The minimum number of samples needed to make a leaf.
     random_state: int (default=None)
         Random state for reproducibility.
+    n_jobs: int (default=1)
+        Number of threads used for building trees and prediction, -1 uses all cores.
     verbose: int (default=0)
         Verbosity level.
     """
@@ -69,6 +73,7 @@ class Forest(object):
                  min_samples_split=2,
                  min_samples_leaf=1,
                  random_state=None,
+                 n_jobs=1,
                  verbose=0):
         self.topd = topd
         self.k = k
@@ -79,6 +84,7 @@ class Forest(object):
         self.min_samples_split = min_samples_split
         self.min_samples_leaf = min_samples_leaf
         self.random_state = random_state
+        self.n_jobs = n_jobs
         self.verbose = verbose
 
     def __str__(self):
@@ -92,6 +98,7 @@ class Forest(object):
         s += '\nmin_samples_split={}'.format(self.min_samples_split)
         s += '\nmin_samples_leaf={}'.format(self.min_samples_leaf)
         s += '\nrandom_state={}'.format(self.random_state)
+        s += '\nn_jobs={}'.format(self.n_jobs)
         s += '\nverbose={}'.format(self.verbose)
         return s
 
@@ -123,51 +130,69 @@ class Forest(object):
         # one central location for the data
         self.manager_ = _DataManager(X, y)
 
-        # build forest
-        self.trees_ = []
-        for i in range(self.n_estimators):
-            # print('\n\nTree {:,}'.format(i))
+        # build forest, trees are independent and release the GIL while building
+        n_threads = check_n_jobs(self.n_jobs)
+        if n_threads == 1:
+            self.trees_ = [self._build_tree(X, y, i) for i in range(self.n_estimators)]
 
-            # build tree
-            tree = Tree(topd=self.topd_,
-                        k=self.k,
-                        max_depth=self.max_depth_,
-                        criterion=self.criterion,
-                        min_samples_split=self.min_samples_split,
-                        min_samples_leaf=self.min_samples_leaf,
-                        random_state=self.random_state_ + i,
-                        verbose=self.verbose)
+        else:
+            with ThreadPoolExecutor(max_workers=n_threads) as executor:
+                self.trees_ = list(executor.map(lambda i: self._build_tree(X, y, i),
+                                                range(self.n_estimators)))
 
-            tree = tree.fit(X, y, max_features=self.max_features_, manager=self.manager_)
+        return self
 
-            # add to forest
-            self.trees_.append(tree)
+    def _build_tree(self, X, y, i):
+        """
+        Build the i-th tree of the forest.
+        """
+        tree = Tree(topd=self.topd_,
+                    k=self.k,
+                    max_depth=self.max_depth_,
+                    criterion=self.criterion,
+                    min_samples_split=self.min_samples_split,
+                    min_samples_leaf=self.min_samples_leaf,
+                    random_state=self.random_state_ + i,
+                    n_jobs=self.n_jobs,
+                    verbose=self.verbose)
 
-        return self
+        return tree.fit(X, y, max_features=self.max_features_, manager=self.manager_)
 
     def predict(self, X):
         """
         Classify samples one by one and return the set of labels.
         """
-        y_proba = self.predict_proba(X)
-        y_pred = np.argmax(y_proba, axis=1)
+        y_pos = self._predict_pos_proba(X)
+        y_pred = (y_pos > 0.5).astype(np.int32)
         return y_pred
 
     def predict_proba(self, X):
         """
         Classify samples one by one and return the set of labels.
         """
+        y_pos = self._predict_pos_proba(X)
+
+        # write both class columns into a single output array
+        y_proba = np.empty((X.shape[0], 2), dtype=y_pos.dtype)
+        y_proba[:, 1] = y_pos
+        np.subtract(1, y_pos, out=y_proba[:, 0])
+        return y_proba
+
+    def _predict_pos_proba(self, X):
+        """
+        Return the probability of the positive label for each sample.
+        """
         assert X.ndim == 2
         X = check_data(X)
 
         # sum all predictions instead of storing them
+        n_threads = check_n_jobs(self.n_jobs)
         forest_preds = np.zeros(X.shape[0])
-        for i, tree in enumerate(self.trees_):
-            forest_preds += tree.predict_proba(X)[:, 1]
+        for tree in self.trees_:
+            forest_preds += tree.tree_.predict(X, n_threads)
 
-        y_mean = (forest_preds / len(self.trees_)).reshape(-1, 1)
-        y_proba = np.hstack([1 - y_mean, y_mean])
-        return y_proba
+        forest_preds /= len(self.trees_)
+        return forest_preds
 
     def delete(self, remove_indices):
         """
@@ -294,6 +319,7 @@ class Forest(object):
         d['min_samples_split'] = self.min_samples_split
         d['min_samples_leaf'] = self.min_samples_leaf
         d['random_state'] = self.random_state
+        d['n_jobs'] = self.n_jobs
         d['verbose'] = self.verbose
 
         if deep:
@@ -332,6 +358,8 @@ class Tree(object):
         The minimum number of samples needed to make a leaf.
     random_state: int (default=None)
         Random state for reproducibility.
+    n_jobs: int (default=1)
+        Number of threads used for prediction, -1 uses all cores.
     verbose: int (default=0)
         Verbosity level.
     """
@@ -343,6 +371,7 @@ class Tree(object):
                  min_samples_split=2,
                  min_samples_leaf=1,
                  random_state=None,
+                 n_jobs=1,
                  verbose=0):
         self.topd = topd
         self.k = k
@@ -351,6 +380,7 @@ class Tree(object):
         self.min_samples_split = min_samples_split
         self.min_samples_leaf = min_samples_leaf
         self.random_state = random_state
+        self.n_jobs = n_jobs
         self.verbose = verbose
 
     def __str__(self):
@@ -362,6 +392,7 @@ class Tree(object):
         s += '\nmin_samples_split={}'.format(self.min_samples_split)
         s += '\nmin_samples_leaf={}'.format(self.min_samples_leaf)
         s += '\nrandom_state={}'.format(self.random_state)
+        s += '\nn_jobs={}'.format(self.n_jobs)
         s += '\nverbose={}'.format(self.verbose)
         return s
 
@@ -429,19 +460,29 @@ class Tree(object):
         """
         Classify samples one by one and return the set of labels.
         """
-        y_proba = self.predict_proba(X)
-        y_pred = np.argmax(y_proba, axis=1)
+        y_pos = self._predict_pos_proba(X)
+        y_pred = (y_pos > 0.5).astype(np.int32)
         return y_pred
 
     def predict_proba(self, X):
         """
         Classify samples one by one and return the set of labels.
         """
+        y_pos = self._predict_pos_proba(X)
+
+        # write both class columns into a single output array
+        y_proba = np.empty((X.shape[0], 2), dtype=y_pos.dtype)
+        y_proba[:, 1] = y_pos
+        np.subtract(1, y_pos, out=y_proba[:, 0])
+        return y_proba
+
+    def _predict_pos_proba(self, X):
+        """
+        Return the probability of the positive label for each sample.
+        """
         assert X.ndim == 2
         X = check_data(X)
-        y_pos = self.tree_.predict(X).reshape(-1, 1)
-        y_proba = np.hstack([1 - y_pos, y_pos])
-        return y_proba
+        return self.tree_.predict(X, check_n_jobs(self.n_jobs))
 
     def print(self, show_nodes=False):
         """
@@ -550,6 +591,7 @@ class Tree(object):
         d['min_samples_split'] = self.min_samples_split
         d['min_samples_leaf'] = self.min_samples_leaf
         d['random_state'] = self.random_state
+        d['n_jobs'] = self.n_jobs
         d['verbose'] = self.verbose
         return d
 
@@ -649,6 +691,23 @@ def check_max_features(max_features, n_features):
     return result
 
 
+def check_n_jobs(n_jobs):
+    """
+    Turn `n_jobs` into a number of threads, following the
+    scikit-learn convention: None means 1, and negative values
+    count back from the number of cores (-1 uses all of them).
+    """
+    if n_jobs is None:
+        return 1
+
+    assert n_jobs != 0, 'n_jobs cannot be zero!'
+
+    if n_jobs < 0:
+        return max(os.cpu_count() + 1 + n_jobs, 1)
+
+    return n_jobs
+
+
 def check_data(X, y=None):
     """
     Makes sure data is of double type,
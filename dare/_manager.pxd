@@ -4,6 +4,7 @@ cimport numpy as np
 from ._tree cimport IntList
 from ._utils cimport DTYPE_t
 from ._utils cimport SIZE_t
+from ._utils cimport INT8_t
 from ._utils cimport INT32_t
 from ._utils cimport UINT32_t
 
@@ -15,8 +16,8 @@ cdef class _DataManager:
     # Internal structure
     cdef SIZE_t    n_samples       # Number of samples
     cdef SIZE_t    n_features      # Number of features
-    cdef DTYPE_t** X               # Sample data
-    cdef INT32_t*  y               # Label data
+    cdef DTYPE_t** X               # Sample data, stored by column: X[feature][sample]
+    cdef INT8_t*   y               # Label data
     cdef SIZE_t    n_vacant        # Number of empty indices in the database
     cdef SIZE_t*   vacant          # Empty indices in the database
     # cdef SIZE_t*   add_indices     # Added indices in the database
@@ -30,6 +31,6 @@ cdef class _DataManager:
     # C API
     cdef INT32_t check_remove_samples_validity(self, IntList* remove_samples) nogil
     cdef INT32_t check_single_remove_sample_validity(self, SIZE_t remove_index) nogil
-    cdef void get_data(self, DTYPE_t*** X_ptr, INT32_t** y_ptr) nogil
+    cdef void get_data(self, DTYPE_t*** X_ptr, INT8_t**  y_ptr) nogil
     # cdef SIZE_t* get_add_indices(self) nogil
     # cdef np.ndarray _get_int_ndarray(self, SIZE_t *data, SIZE_t n_elem)
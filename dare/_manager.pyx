@@ -55,19 +55,24 @@ cdef class _DataManager:
         cdef SIZE_t n_samples = X_in.shape[0]
         cdef SIZE_t n_features = X_in.shape[1]
 
-        cdef DTYPE_t** X = <DTYPE_t **>malloc(n_samples * sizeof(DTYPE_t *))
-        cdef INT32_t*  y = <INT32_t *>malloc(n_samples * sizeof(INT32_t))
+        cdef DTYPE_t** X = <DTYPE_t **>malloc(n_features * sizeof(DTYPE_t *))
+        cdef INT8_t*   y = <INT8_t *>malloc(n_samples * sizeof(INT8_t))
 
         cdef SIZE_t *vacant = NULL
 
         cdef SIZE_t i
         cdef SIZE_t j
 
-        # copy data into C pointer arrays
+        # store features column by column in one contiguous block, so scanning
+        # the values of a single feature only touches that feature's column
+        X[0] = <DTYPE_t *>malloc(n_features * n_samples * sizeof(DTYPE_t))
+        for j in range(n_features):
+            X[j] = X[0] + j * n_samples
+            for i in range(n_samples):
+                X[j][i] = X_in[i][j]
+
+        # copy labels
         for i in range(n_samples):
-            X[i] = <DTYPE_t *>malloc(n_features * sizeof(DTYPE_t))
-            for j in range(n_features):
-                X[i][j] = X_in[i][j]
             y[i] = y_in[i]
 
         self.X = X
@@ -82,9 +87,7 @@ cdef class _DataManager:
         Destructor.
         """
         # printf('[M] dealloc\n')
-        for i in range(self.n_samples + self.n_vacant):
-            if self.X[i]:
-                free(self.X[i])
+        free(self.X[0])
         free(self.X)
         free(self.y)
         if self.vacant:
@@ -96,26 +99,11 @@ cdef class _DataManager:
         Checks to make sure `remove_samples` are in the database.
         Returns -1 if a sample is not available; 0 otherwise.
         """
-        cdef SIZE_t *vacant = self.vacant
-        cdef SIZE_t n_vacant = self.n_vacant
-
         cdef INT32_t result = 0
         cdef SIZE_t i
-        cdef SIZE_t j
 
         for i in range(remove_samples.n):
-
-            # check if index number is valid
-            if remove_samples.arr[i] < 0:
-                result = -1
-
-            for j in range(n_vacant):
-
-                # check if sample has already been deleted
-                if remove_samples.arr[i] == vacant[j]:
-                    result = -1
-                    break
-
+            result = self.check_single_remove_sample_validity(remove_samples.arr[i])
             if result == -1:
                 break
 
@@ -125,33 +113,25 @@ cdef class _DataManager:
         """
         Checks to make sure `samples` are in the database.
         Returns -1 if a sample is not available; 0 otherwise.
-        """
-
-        # indices of samples that have been deleted
-        cdef SIZE_t *vacant = self.vacant
-        cdef SIZE_t n_vacant = self.n_vacant
 
-        # counters
-        cdef SIZE_t j = 0
+        Deleted samples have their label set to UNDEF, so this is
+        a constant-time lookup instead of a scan of the vacant indices.
+        """
 
         # return variable
         cdef INT32_t result = 0
 
         # check if index number is valid
-        if remove_index < 0:
+        if remove_index < 0 or remove_index >= self.n_samples + self.n_vacant:
             result = -1
 
-        # loop through deleted sample indices
-        for j in range(n_vacant):
-
-            # check if sample has already been deleted
-            if vacant[j] == remove_index:
-                result = -1
-                break
+        # check if sample has already been deleted
+        elif self.y[remove_index] == UNDEF:
+            result = -1
 
         return result
 
-    cdef void get_data(self, DTYPE_t*** X_ptr, INT32_t** y_ptr) nogil:
+    cdef void get_data(self, DTYPE_t*** X_ptr, INT8_t**  y_ptr) nogil:
         """
         Receive pointers to the data.
         """
@@ -164,8 +144,7 @@ cdef class _DataManager:
         """
 
         # parameters
-        cdef DTYPE_t** X = self.X
-        cdef INT32_t*  y = self.y
+        cdef INT8_t*   y = self.y
         cdef SIZE_t*   vacant = self.vacant
         cdef SIZE_t       n_vacant = self.n_vacant
 
@@ -181,10 +160,9 @@ cdef class _DataManager:
         elif updated_n_vacant > n_vacant:
             vacant = <SIZE_t *>realloc(vacant, updated_n_vacant * sizeof(SIZE_t))
 
-        # remove data and save the deleted indices
+        # remove data and save the deleted indices; feature values stay
+        # in the column block, only the label is invalidated
         for i in range(n_samples):
-            free(X[samples[i]])
-            X[samples[i]] = NULL
             y[samples[i]] = UNDEF
             vacant[n_vacant + i] = samples[i]
 
@@ -199,7 +177,7 @@ cdef class _DataManager:
 
     #     # parameters
     #     cdef DTYPE_t** X = self.X
-    #     cdef INT32_t*  y = self.y
+    #     cdef INT8_t*   y = self.y
     #     cdef SIZE_t*   vacant = self.vacant
     #     cdef SIZE_t    n_vacant = self.n_vacant
     #     cdef SIZE_t    n_samples = self.n_samples
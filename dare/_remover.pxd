@@ -12,9 +12,17 @@ from ._tree cimport _TreeBuilder
 from ._config cimport _Config
 from ._utils cimport DTYPE_t
 from ._utils cimport SIZE_t
+from ._utils cimport INT8_t
 from ._utils cimport INT32_t
 from ._utils cimport UINT32_t
 
+"""
+Struct to hold a subtree and the samples still to be removed from it.
+"""
+cdef struct RemoveRecord:
+    Node**   node_ptr                        # Subtree root, replaced if retrained
+    IntList* remove_samples                  # Samples to remove from this subtree
+
 cdef class _Remover:
     """
     Recursively removes data from a _Tree built using _TreeBuilder;
@@ -34,19 +42,19 @@ cdef class _Remover:
     cdef INT32_t* remove_costs               # No. samples that need to be retrained
 
     # Python API
-    cpdef INT32_t remove(self, _Tree tree, np.ndarray remove_indices)
+    cpdef INT32_t remove(self, _Tree tree, np.ndarray remove_indices) except *
     cpdef void clear_metrics(self)
 
     # C API
     cdef void _remove(self,
                       Node**    node_ptr,
                       DTYPE_t** X,
-                      INT32_t*  y,
+                      INT8_t*   y,
                       IntList*  remove_samples) nogil
 
     cdef void update_node(self,
                           Node*    node,
-                          INT32_t* y,
+                          INT8_t*  y,
                           IntList* remove_samples) nogil
 
     cdef void update_leaf(self,
@@ -60,13 +68,13 @@ cdef class _Remover:
     cdef void retrain(self,
                       Node**    node_ptr,
                       DTYPE_t** X,
-                      INT32_t*  y,
+                      INT8_t*   y,
                       IntList*  remove_samples) nogil
 
     cdef INT32_t contains_valid_split(self,
                                       Node*     node,
                                       DTYPE_t** X,
-                                      INT32_t*  y,
+                                      INT8_t*   y,
                                       IntList*  samples) nogil
 
     cdef INT32_t select_optimal_split(self,
@@ -75,19 +83,19 @@ cdef class _Remover:
     cdef SIZE_t update_metadata(self,
                                 Node*     node,
                                 DTYPE_t** X,
-                                INT32_t*  y,
+                                INT8_t*   y,
                                 IntList*  remove_samples) nogil
 
     cdef SIZE_t update_greedy_node_metadata(self,
                                             Node*     node,
                                             DTYPE_t** X,
-                                            INT32_t*  y,
+                                            INT8_t*   y,
                                             IntList*  remove_samples) nogil
 
     cdef SIZE_t update_random_node_metadata(self,
                                             Node*     node,
                                             DTYPE_t** X,
-                                            INT32_t*  y,
+                                            INT8_t*   y,
                                             IntList*  remove_samples) nogil
 
     # metric methods
@@ -110,8 +118,8 @@ cdef SIZE_t sample_new_thresholds(Feature*  feature,
                                   SIZE_t*   threshold_validities,
                                   Node*     node,
                                   DTYPE_t** X,
-                                  INT32_t*  y,
-                                  IntList*  remove_samples,
+                                  INT8_t*   y,
+                                  IntList*  samples,
                                   bint*     is_constant_feature_ptr,
                                   _Config   config) nogil
 
@@ -121,8 +129,8 @@ cdef SIZE_t sample_new_features(Feature*** features_ptr,
                                 SIZE_t     n_total_features,
                                 Node*      node,
                                 DTYPE_t**  X,
-                                INT32_t*   y,
-                                IntList*   remove_samples,
+                                INT8_t*    y,
+                                IntList*   samples,
                                 _Config    config) nogil
 
 cdef void get_leaf_samples(Node*    node,
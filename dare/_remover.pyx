@@ -10,6 +10,7 @@ from cpython.ref cimport PyObject
 cimport cython
 
 from libc.stdlib cimport free
+from libc.stdlib cimport calloc
 from libc.stdlib cimport malloc
 from libc.stdlib cimport realloc
 from libc.stdio cimport printf
@@ -109,7 +110,7 @@ cdef class _Remover:
         if self.remove_depths:
             free(self.remove_depths)
 
-    cpdef INT32_t remove(self, _Tree tree, np.ndarray remove_indices):
+    cpdef INT32_t remove(self, _Tree tree, np.ndarray remove_indices) except *:
         """
         Remove the data specified by the `remove_indices` from the
         learned _Tree.
@@ -117,7 +118,7 @@ cdef class _Remover:
 
         # Data containers
         cdef DTYPE_t** X = NULL
-        cdef INT32_t*  y = NULL
+        cdef INT8_t*   y = NULL
         self.manager.get_data(&X, &y)
 
         # convert the remove indices ndarray to an IntList object
@@ -130,42 +131,60 @@ cdef class _Remover:
         if result == -1:
             return -1
 
-        # recurse through the tree and retrain nodes / subtrees as necessary
+        # traverse the tree and retrain nodes / subtrees as necessary
         self._remove(&tree.root, X, y, remove_samples)
 
+        # re-flatten the updated tree for prediction
+        tree._update_flat()
+
     cdef void _remove(self,
                       Node**    node_ptr,
                       DTYPE_t** X,
-                      INT32_t*  y,
+                      INT8_t*   y,
                       IntList*  remove_samples) nogil:
         """
-        Update and retrain this node if necessary, otherwise traverse
-        to its children.
+        Update and retrain each affected node if necessary, otherwise
+        traverse to its children.
+
+        Subtrees left to visit are kept on an explicit stack, the right
+        child is pushed before the left to keep the depth-first order.
         """
-        cdef Node* node = node_ptr[0]
+        cdef Node* node = NULL
 
         # result containers
         cdef SplitRecord split
         cdef SIZE_t      n_usable_thresholds = 0
         cdef INT32_t     result = 0
 
-        # printf('\n[R] n_remove_samples: %ld, depth: %ld, is_left: %d\n', remove_samples.n, node.depth, node.is_left)
+        # stack of subtrees left to visit
+        cdef SIZE_t        stack_capacity = 64
+        cdef SIZE_t        stack_n = 1
+        cdef RemoveRecord* stack = <RemoveRecord *>malloc(stack_capacity * sizeof(RemoveRecord))
+        stack[0].node_ptr = node_ptr
+        stack[0].remove_samples = remove_samples
 
-        # update node counts
-        self.update_node(node, y, remove_samples)
+        while stack_n > 0:
+            stack_n -= 1
+            node_ptr = stack[stack_n].node_ptr
+            remove_samples = stack[stack_n].remove_samples
+            node = node_ptr[0]
 
-        # leaf, check complete
-        if node.is_leaf:
-            # printf('[R] update leaf\n')
-            self.update_leaf(node, remove_samples)
+            # printf('\n[R] n_remove_samples: %ld, depth: %ld, is_left: %d\n', remove_samples.n, node.depth, node.is_left)
 
-        # decision node, but samples in same class, convert to leaf, check complete
-        elif node.n_pos_samples == 0 or node.n_pos_samples == node.n_samples:
-            # printf('[R] convert to leaf\n')
-            self.convert_to_leaf(node, remove_samples)
+            # update node counts
+            self.update_node(node, y, remove_samples)
 
-        # decision node
-        else:
+            # leaf, check complete
+            if node.is_leaf:
+                # printf('[R] update leaf\n')
+                self.update_leaf(node, remove_samples)
+                continue
+
+            # decision node, but samples in same class, convert to leaf, check complete
+            if node.n_pos_samples == 0 or node.n_pos_samples == node.n_samples:
+                # printf('[R] convert to leaf\n')
+                self.convert_to_leaf(node, remove_samples)
+                continue
 
             # update metadata
             # printf('[R] update metadata, depth=%lu\n', node.depth)
@@ -175,31 +194,42 @@ cdef class _Remover:
             if n_usable_thresholds == 0:
                 # printf('[R] convert to leaf\n')
                 self.convert_to_leaf(node, remove_samples)
+                continue
 
             # invalid chosen split, different optimal split, or same optimal split
-            else:
-                result = self.select_optimal_split(node)
+            result = self.select_optimal_split(node)
 
-                # optimal split is invalid or has changed
-                if n_usable_thresholds < 0 or result == 1:
-                    self.retrain(node_ptr, X, y, remove_samples)
+            # optimal split is invalid or has changed
+            if n_usable_thresholds < 0 or result == 1:
+                self.retrain(node_ptr, X, y, remove_samples)
+                continue
 
-                # no changes
-                else:
-                    split_samples(node, X, y, remove_samples, &split, 0)
+            # no changes
+            split_samples(node, X, y, remove_samples, &split, 0)
+
+            # make room for both children
+            if stack_n + 2 > stack_capacity:
+                stack_capacity *= 2
+                stack = <RemoveRecord *>realloc(stack, stack_capacity * sizeof(RemoveRecord))
+
+            # traverse right if any deleted samples go right
+            if split.right_samples != NULL:
+                stack[stack_n].node_ptr = &node.right
+                stack[stack_n].remove_samples = split.right_samples
+                stack_n += 1
 
-                    # traverse left if any deleted samples go left
-                    if split.left_samples != NULL:
-                        self._remove(&node.left, X, y, split.left_samples)
+            # traverse left (next) if any deleted samples go left
+            if split.left_samples != NULL:
+                stack[stack_n].node_ptr = &node.left
+                stack[stack_n].remove_samples = split.left_samples
+                stack_n += 1
 
-                    # traverse right if any deleted samples go right
-                    if split.right_samples != NULL:
-                        self._remove(&node.right, X, y, split.right_samples)
+        free(stack)
 
     # private
     cdef void update_node(self,
                           Node*    node,
-                          INT32_t* y,
+                          INT8_t*  y,
                           IntList* remove_samples) nogil:
         """
         Update node counts based on the `remove_samples` being deleted.
@@ -288,7 +318,7 @@ cdef class _Remover:
     cdef void retrain(self,
                       Node**    node_ptr,
                       DTYPE_t** X,
-                      INT32_t*  y,
+                      INT8_t*   y,
                       IntList*  remove_samples) nogil:
         """
         Random Node
@@ -305,6 +335,7 @@ cdef class _Remover:
         # node properties
         cdef SIZE_t depth = node.depth
         cdef bint   is_left = node.is_left
+        cdef SIZE_t n_pos_samples = node.n_pos_samples
 
         # updated array of leaf samples
         cdef IntList* leaf_samples = create_intlist(node.n_samples, 0)
@@ -348,9 +379,10 @@ cdef class _Remover:
             split_samples(node, X, y, leaf_samples, &split, 1)
 
             # build child subtrees
-            node.left = self.tree_builder._build(X, y, split.left_samples, split.left_constant_features, depth + 1, 1)
-            node.right = self.tree_builder._build(X, y, split.right_samples, split.right_constant_features,
-                                                  depth + 1, 0)
+            node.left = self.tree_builder._build(X, y, split.left_samples, split.n_left_pos_samples,
+                                                 split.left_constant_features, depth + 1, 1)
+            node.right = self.tree_builder._build(X, y, split.right_samples, split.n_right_pos_samples,
+                                                  split.right_constant_features, depth + 1, 0)
 
         # retrain this node / subtree
         else:
@@ -358,7 +390,8 @@ cdef class _Remover:
             constant_features = copy_intlist(node.constant_features, node.constant_features.n)
             dealloc(node)  # free node / subtree
             free(node)
-            node_ptr[0] = self.tree_builder._build(X, y, leaf_samples, constant_features, depth, is_left)
+            node_ptr[0] = self.tree_builder._build(X, y, leaf_samples, n_pos_samples, constant_features,
+                                                   depth, is_left)
 
         # record retrain metric
         self.add_metric(1, node_ptr[0].depth, node_ptr[0].n_samples)
@@ -367,7 +400,7 @@ cdef class _Remover:
     cdef INT32_t contains_valid_split(self,
                                       Node*     node,
                                       DTYPE_t** X,
-                                      INT32_t*  y,
+                                      INT8_t*   y,
                                       IntList*  samples) nogil:
         """
         Checks to see if the chosen feature is still valid (not constant);
@@ -395,7 +428,7 @@ cdef class _Remover:
 
         # find min. and max. values
         for i in range(samples.n):
-            cur_val = X[samples.arr[i]][feature_index]
+            cur_val = X[feature_index][samples.arr[i]]
 
             if cur_val < min_val:
                 min_val = cur_val
@@ -415,12 +448,10 @@ cdef class _Remover:
             while threshold_value >= max_val or threshold_value < min_val:
                 threshold_value = <DTYPE_t>rand_uniform(min_val, max_val, random_state)
 
-            # count left and right branches
+            # count left and right branches, without a data-dependent branch
             for i in range(samples.n):
-                if X[samples.arr[i]][feature_index] <= threshold_value:
-                    n_left_samples += 1
-                else:
-                    n_right_samples += 1
+                n_left_samples += X[feature_index][samples.arr[i]] <= threshold_value
+            n_right_samples = samples.n - n_left_samples
 
             # printf('n_left_samples: %lu, n_right_samples: %lu\n', n_left_samples, n_right_samples)
 
@@ -505,7 +536,7 @@ cdef class _Remover:
     cdef SIZE_t update_metadata(self,
                                 Node*     node,
                                 DTYPE_t** X,
-                                INT32_t*  y,
+                                INT8_t*   y,
                                 IntList*  remove_samples) nogil:
         """
         Update each feature / threshold and return the number of usable thresholds.
@@ -527,7 +558,7 @@ cdef class _Remover:
     cdef SIZE_t update_greedy_node_metadata(self,
                                             Node*     node,
                                             DTYPE_t** X,
-                                            INT32_t*  y,
+                                            INT8_t*   y,
                                             IntList*  remove_samples) nogil:
         """
         Update each threshold for all features at this node.
@@ -558,6 +589,18 @@ cdef class _Remover:
         # invalid features
         cdef IntList* invalid_features = create_intlist(node.n_features, 0)
 
+        # updated samples for this node, gathered at most once when resampling is needed
+        cdef IntList* samples = NULL
+
+        # values and labels of the deleted samples, gathered once per feature / node
+        cdef DTYPE_t* remove_values = <DTYPE_t *>malloc(remove_samples.n * sizeof(DTYPE_t))
+        cdef INT8_t*  remove_labels = <INT8_t *>malloc(remove_samples.n * sizeof(INT8_t))
+        cdef DTYPE_t* Xf = NULL
+
+        # copy labels of the deleted samples
+        for i in range(remove_samples.n):
+            remove_labels[i] = y[remove_samples.arr[i]]
+
         # return variables
         cdef SIZE_t result = 0
         cdef SIZE_t n_usable_thresholds = 0
@@ -576,6 +619,11 @@ cdef class _Remover:
             n_invalid_thresholds = 0
             n_valid_thresholds = 0
 
+            # copy values of the deleted samples for this feature
+            Xf = X[feature.index]
+            for i in range(remove_samples.n):
+                remove_values[i] = Xf[remove_samples.arr[i]]
+
             # printf('[R - UM] feature.index: %ld, feature.n_thresholds: %ld\n',
             #        feature.index, feature.n_thresholds)
 
@@ -590,24 +638,24 @@ cdef class _Remover:
                 for i in range(remove_samples.n):
 
                     # decrement left branch of this threshold
-                    if X[remove_samples.arr[i]][feature.index] <= threshold.value:
+                    if remove_values[i] <= threshold.value:
                         threshold.n_left_samples -= 1
-                        threshold.n_left_pos_samples -= y[remove_samples.arr[i]]
+                        threshold.n_left_pos_samples -= remove_labels[i]
 
                     # decrement right branch of this threshold
                     else:
                         threshold.n_right_samples -= 1
-                        threshold.n_right_pos_samples -= y[remove_samples.arr[i]]
+                        threshold.n_right_pos_samples -= remove_labels[i]
 
                     # decrement left value of this threshold
-                    if X[remove_samples.arr[i]][feature.index] == threshold.v1:
+                    if remove_values[i] == threshold.v1:
                         threshold.n_v1_samples -= 1
-                        threshold.n_v1_pos_samples -= y[remove_samples.arr[i]]
+                        threshold.n_v1_pos_samples -= remove_labels[i]
 
                     # decrement right value of this threshold
-                    elif X[remove_samples.arr[i]][feature.index] == threshold.v2:
+                    elif remove_values[i] == threshold.v2:
                         threshold.n_v2_samples -= 1
-                        threshold.n_v2_pos_samples -= y[remove_samples.arr[i]]
+                        threshold.n_v2_pos_samples -= remove_labels[i]
 
                 # compute label ratios for adjacent values of the threshold
                 v1_label_ratio = threshold.n_v1_pos_samples / (1.0 * threshold.n_v1_samples)
@@ -667,9 +715,13 @@ cdef class _Remover:
                 # possibly other thresholds, sample new thresholds for this feature
                 else:
                     # printf('[R - UGNM] possibly other thresholds, sample new thresholds\n')
+                    if samples == NULL:
+                        samples = create_intlist(node.n_samples, 0)
+                        get_leaf_samples(node, remove_samples, samples)
+
                     n_new_thresholds = sample_new_thresholds(feature, n_valid_thresholds,
                                                              threshold_validities, node, X, y,
-                                                             remove_samples, NULL, self.config)
+                                                             samples, NULL, self.config)
 
                     # all thresholds invalid, flag feature for replacement
                     if n_new_thresholds == 0 and n_valid_thresholds == 0:
@@ -686,9 +738,13 @@ cdef class _Remover:
         # replace invalid features
         # printf('[R - UGNM] invalid_features.n: %ld\n', invalid_features.n)
         if invalid_features.n > 0:
+            if samples == NULL:
+                samples = create_intlist(node.n_samples, 0)
+                get_leaf_samples(node, remove_samples, samples)
+
             n_usable_thresholds += sample_new_features(&node.features, &node.constant_features,
                                                        invalid_features, n_total_features, node, X, y,
-                                                       remove_samples, self.config)
+                                                       samples, self.config)
 
             # printf('[R - UGNM] node.n_features: %ld\n', node.n_features)
 
@@ -698,6 +754,10 @@ cdef class _Remover:
 
         # clean up
         free_intlist(invalid_features)
+        free(remove_values)
+        free(remove_labels)
+        if samples != NULL:
+            free_intlist(samples)
 
         # select return value
         if n_usable_thresholds == 0:
@@ -712,7 +772,7 @@ cdef class _Remover:
     cdef SIZE_t update_random_node_metadata(self,
                                             Node*     node,
                                             DTYPE_t** X,
-                                            INT32_t*  y,
+                                            INT8_t*   y,
                                             IntList*  remove_samples) nogil:
         """
         Update the metadata for the chosen feature / threshold of the
@@ -725,16 +785,18 @@ cdef class _Remover:
         # return variable
         cdef SIZE_t n_usable_thresholds = 1
 
-        # loop through samples to be removed
-        for i in range(remove_samples.n):
+        # no. samples to be removed from the left branch
+        cdef SIZE_t   n_left_remove_samples = 0
+        cdef DTYPE_t* Xf = X[node.chosen_feature.index]
+        cdef DTYPE_t  threshold_value = node.chosen_threshold.value
 
-            # decrement left branch sample count
-            if X[remove_samples.arr[i]][node.chosen_feature.index] <= node.chosen_threshold.value:
-                node.chosen_threshold.n_left_samples -= 1
+        # loop through samples to be removed, without a data-dependent branch
+        for i in range(remove_samples.n):
+            n_left_remove_samples += Xf[remove_samples.arr[i]] <= threshold_value
 
-            # decrement right branch sample count
-            else:
-                node.chosen_threshold.n_right_samples -= 1
+        # decrement left and right branch sample counts
+        node.chosen_threshold.n_left_samples -= n_left_remove_samples
+        node.chosen_threshold.n_right_samples -= remove_samples.n - n_left_remove_samples
 
         # not enough samples in both branches, invalid threshold
         if (node.chosen_threshold.n_left_samples < min_samples_leaf or
@@ -834,12 +896,14 @@ cdef SIZE_t sample_new_thresholds(Feature*  feature,
                                   SIZE_t*   threshold_validities,
                                   Node*     node,
                                   DTYPE_t** X,
-                                  INT32_t*  y,
-                                  IntList*  remove_samples,
+                                  INT8_t*   y,
+                                  IntList*  samples,
                                   bint*     is_constant_feature_ptr,
                                   _Config   config) nogil:
     """
     Try to sample new thresholds for all invalid thresholds for this feature.
+
+    NOTE: `samples` are the updated samples of this node, gathered by the caller.
     """
 
     # configuration
@@ -855,7 +919,7 @@ cdef SIZE_t sample_new_thresholds(Feature*  feature,
     cdef INT32_t ndx = 0
 
     # candidate threshold variables
-    cdef Threshold** candidate_thresholds = NULL
+    cdef Threshold*  candidate_thresholds = NULL
     cdef SIZE_t      n_candidate_thresholds = 0
 
     # unused candidate threshold array variables
@@ -875,22 +939,17 @@ cdef SIZE_t sample_new_thresholds(Feature*  feature,
     # return variable
     cdef SIZE_t n_usable_thresholds = 0
 
-    # get updated samples for this node
-    cdef IntList* samples = create_intlist(node.n_samples, 0)
-    get_leaf_samples(node, remove_samples, samples)
-
     # helper variables
     cdef DTYPE_t* values = <DTYPE_t *>malloc(samples.n * sizeof(DTYPE_t))
-    cdef INT32_t* labels = <INT32_t *>malloc(samples.n * sizeof(INT32_t))
+    cdef INT8_t*  labels = <INT8_t *>malloc(samples.n * sizeof(INT8_t))
     cdef SIZE_t*  indices = <SIZE_t *>malloc(samples.n * sizeof(SIZE_t))
-    cdef SIZE_t   n_pos_samples = 0
+    cdef SIZE_t   n_pos_samples = node.n_pos_samples
 
-    # copy values and labels into new arrays, and count no. pos. labels
+    # copy values and labels into new arrays, node counts are already updated
     for i in range(samples.n):
-        values[i] = X[samples.arr[i]][feature.index]
+        values[i] = X[feature.index][samples.arr[i]]
         labels[i] = y[samples.arr[i]]
         indices[i] = i
-        n_pos_samples += y[samples.arr[i]]
 
     # sort feature values, and their corresponding indices
     sort(values, indices, samples.n)
@@ -901,10 +960,10 @@ cdef SIZE_t sample_new_thresholds(Feature*  feature,
             is_constant_feature_ptr[0] = True
 
     # get candidate thresholds
-    candidate_thresholds = <Threshold **>malloc(samples.n * sizeof(Threshold *))
+    candidate_thresholds = <Threshold *>malloc(samples.n * sizeof(Threshold))
     n_candidate_thresholds = get_candidate_thresholds(values, labels, indices,
                                                       samples.n, n_pos_samples,
-                                                      min_samples_leaf, &candidate_thresholds)
+                                                      min_samples_leaf, candidate_thresholds)
 
     # array of candidate thresholds that are not being used
     unused_thresholds = <Threshold **>malloc(n_candidate_thresholds * sizeof(Threshold *))
@@ -922,7 +981,7 @@ cdef SIZE_t sample_new_thresholds(Feature*  feature,
 
         # add candidate threshold to list of unused candidate thresholds
         if not used:
-            unused_thresholds[n_unused_thresholds] = candidate_thresholds[i]
+            unused_thresholds[n_unused_thresholds] = &candidate_thresholds[i]
             n_unused_thresholds += 1
 
     # compute number of unused thresholds to sample
@@ -968,14 +1027,13 @@ cdef SIZE_t sample_new_thresholds(Feature*  feature,
 
     # free previous thresholds and candidate thresholds arrays
     free_thresholds(feature.thresholds, feature.n_thresholds)
-    free_thresholds(candidate_thresholds, n_candidate_thresholds)
+    free(candidate_thresholds)
 
     # clean up
     free(values)
     free(labels)
     free(indices)
     free(unused_thresholds)
-    free_intlist(samples)
     free_intlist(sampled_indices)
 
     # set new thresholds array for this feature
@@ -991,8 +1049,8 @@ cdef SIZE_t sample_new_features(Feature*** features_ptr,
                                 SIZE_t     n_total_features,
                                 Node*      node,
                                 DTYPE_t**  X,
-                                INT32_t*   y,
-                                IntList*   remove_samples,
+                                INT8_t*    y,
+                                IntList*   samples,
                                 _Config    config) nogil:
     """
     Sample new unused features to replace the invalid features.
@@ -1015,6 +1073,7 @@ cdef SIZE_t sample_new_features(Feature*** features_ptr,
     # keeps track of invalid features
     cdef IntList* constant_features = copy_intlist(constant_features_ptr[0], n_total_features)
     cdef IntList* sampled_features = create_intlist(n_total_features, 0)
+    cdef bint*    is_invalid_feature = NULL
     cdef SIZE_t   n_features = node.n_features - invalid_features.n
     cdef bint     is_constant_feature = False
     cdef bint     valid = False
@@ -1034,33 +1093,26 @@ cdef SIZE_t sample_new_features(Feature*** features_ptr,
         sampled_features.arr[sampled_features.n] = node.features[j].index
         sampled_features.n += 1
 
+    # flag sampled and known constant features for constant-time lookups
+    is_invalid_feature = <bint *>calloc(n_total_features, sizeof(bint))
+    for i in range(sampled_features.n):
+        is_invalid_feature[sampled_features.arr[i]] = True
+    for i in range(constant_features.n):
+        is_invalid_feature[constant_features.arr[i]] = True
+
     # sample features until the previous no. features is reached or there are no features left
     while n_features < node.n_features and (sampled_features.n + constant_features.n) < n_total_features:
 
         # sample feature index
         feature_index = rand_int(0, n_total_features, random_state)
 
-        # already sampled feature
-        valid = True
-        for i in range(sampled_features.n):
-            if sampled_features.arr[i] == feature_index:
-                valid = False
-                break
-        if not valid:
-            continue
-
-        # known constant feature
-        valid = True
-        for i in range(constant_features.n):
-            if constant_features.arr[i] == feature_index:
-                valid = False
-                break
-        if not valid:
+        # already sampled or known constant feature
+        if is_invalid_feature[feature_index]:
             continue
 
         # create a feature and sample thresholds
         feature = create_feature(feature_index)
-        sample_new_thresholds(feature, 0, NULL, node, X, y, remove_samples, &is_constant_feature, config)
+        sample_new_thresholds(feature, 0, NULL, node, X, y, samples, &is_constant_feature, config)
 
         # printf('[R - SNF] is_constant_feature: %d\n', is_constant_feature)
 
@@ -1068,12 +1120,14 @@ cdef SIZE_t sample_new_features(Feature*** features_ptr,
         if is_constant_feature:
             constant_features.arr[constant_features.n] = feature_index
             constant_features.n += 1
+            is_invalid_feature[feature_index] = True
             free_feature(feature)
             continue
 
         # add to sampled features array
         sampled_features.arr[sampled_features.n] = feature_index
         sampled_features.n += 1
+        is_invalid_feature[feature_index] = True
 
         # no valid thresholds, free feature and sample a new feature
         if feature.n_thresholds == 0:
@@ -1137,6 +1191,7 @@ cdef SIZE_t sample_new_features(Feature*** features_ptr,
 
     # clean up
     free_intlist(sampled_features)
+    free(is_invalid_feature)
     free_intlist(constant_features)
 
     return n_usable_thresholds
@@ -1146,86 +1201,76 @@ cdef void get_leaf_samples(Node*    node,
                            IntList* remove_samples,
                            IntList* leaf_samples) nogil:
     """
-    Recursively obtain the samples at the leaves and filter out
+    Obtain the samples at the leaves and filter out
     deleted samples.
     """
-    cdef bint   add_sample = True
-    cdef SIZE_t i = 0
-    cdef SIZE_t j = 0
-
-    # leaf
-    if node.is_leaf:
-
-        # loop through all samples at this leaf
-        for i in range(node.n_samples):
-            add_sample = True
-
-            # loop through all deleted samples
-            for j in range(remove_samples.n):
-
-                # printf('[R - GLS] node.leaf_samples[%ld]: %ld, remove_samples[%ld]: %ld\n',
-                #        i, node.leaf_samples[i], j, remove_samples[j])
-
-                # do not add sample to results if it has been deleted
-                if node.leaf_samples[i] == remove_samples.arr[j]:
-                    add_sample = False
-                    break
-
-            # add sample to results if it has not been deleted
-            if add_sample:
-                leaf_samples.arr[leaf_samples.n] = node.leaf_samples[i]
-                leaf_samples.n += 1
-
-    # decision node
-    else:
-
-        # traverse left
-        if node.left:
-            get_leaf_samples(node.left, remove_samples, leaf_samples)
-
-        # traverse right
-        if node.right:
-            get_leaf_samples(node.right, remove_samples, leaf_samples)
+    get_leaf_samples2(node, remove_samples, leaf_samples.arr, &leaf_samples.n)
 
 cdef void get_leaf_samples2(Node*    node,
                             IntList* remove_samples,
                             SIZE_t*  leaf_samples,
                             SIZE_t*  n_leaf_samples_ptr) nogil:
     """
-    Recursively obtain the samples at the leaves and filter out
-    deleted samples. Returns array and a number, instead of an IntList.
+    Obtain the samples at the leaves and filter out deleted samples.
+    Returns array and a number, instead of an IntList.
+
+    Traverses the subtree with an explicit stack, visiting the leaves
+    from left to right.
+
+    NOTE: `remove_samples` must be sorted; deleted samples are looked up
+    by binary search.
     """
-    cdef bint   add_sample = True
+    cdef SIZE_t sample = 0
     cdef SIZE_t i = 0
-    cdef SIZE_t j = 0
+    cdef SIZE_t lo = 0
+    cdef SIZE_t hi = 0
+    cdef SIZE_t mid = 0
 
-    # leaf
-    if node.is_leaf:
+    # stack of nodes left to visit
+    cdef SIZE_t stack_capacity = 64
+    cdef SIZE_t stack_n = 1
+    cdef Node** stack = <Node **>malloc(stack_capacity * sizeof(Node *))
+    stack[0] = node
 
-        # loop through all samples at this leaf
-        for i in range(node.n_samples):
-            add_sample = True
+    while stack_n > 0:
+        stack_n -= 1
+        node = stack[stack_n]
 
-            # loop through all deleted samples
-            for j in range(remove_samples.n):
+        # leaf
+        if node.is_leaf:
 
-                # do not add sample to results if it has been deleted
-                if node.leaf_samples[i] == remove_samples.arr[j]:
-                    add_sample = False
-                    break
+            # loop through all samples at this leaf
+            for i in range(node.n_samples):
+                sample = node.leaf_samples[i]
+
+                # find the first deleted sample not less than this sample
+                lo = 0
+                hi = remove_samples.n
+                while lo < hi:
+                    mid = (lo + hi) >> 1
+                    if remove_samples.arr[mid] < sample:
+                        lo = mid + 1
+                    else:
+                        hi = mid
 
-            # add sample to results if it has not been deleted
-            if add_sample:
-                leaf_samples[n_leaf_samples_ptr[0]] = node.leaf_samples[i]
-                n_leaf_samples_ptr[0] += 1
+                # add sample to results if it has not been deleted
+                if lo == remove_samples.n or remove_samples.arr[lo] != sample:
+                    leaf_samples[n_leaf_samples_ptr[0]] = sample
+                    n_leaf_samples_ptr[0] += 1
 
-    # decision node
-    else:
+        # decision node, push right first so the left branch is visited first
+        else:
+
+            if stack_n + 2 > stack_capacity:
+                stack_capacity *= 2
+                stack = <Node **>realloc(stack, stack_capacity * sizeof(Node *))
+
+            if node.right:
+                stack[stack_n] = node.right
+                stack_n += 1
 
-        # traverse left
-        if node.left:
-            get_leaf_samples2(node.left, remove_samples, leaf_samples, n_leaf_samples_ptr)
+            if node.left:
+                stack[stack_n] = node.left
+                stack_n += 1
 
-        # traverse right
-        if node.right:
-            get_leaf_samples2(node.right, remove_samples, leaf_samples, n_leaf_samples_ptr)
+    free(stack)
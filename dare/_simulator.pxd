@@ -10,6 +10,7 @@ from ._tree cimport _Tree
 from ._config cimport _Config
 from ._utils cimport DTYPE_t
 from ._utils cimport SIZE_t
+from ._utils cimport INT8_t
 from ._utils cimport INT32_t
 from ._utils cimport UINT32_t
 
@@ -29,7 +30,7 @@ cdef class _Simulator:
     cdef INT32_t _sim_delete(self,
                              Node*     node,
                              DTYPE_t** X,
-                             INT32_t*  y,
+                             INT8_t*   y,
                              SIZE_t    remove_index) nogil
 
     cdef INT32_t check_optimal_split(self,
@@ -40,7 +41,7 @@ cdef class _Simulator:
     cdef SIZE_t update_metadata(self,
                                 Node*      node,
                                 DTYPE_t**  X,
-                                INT32_t*   y,
+                                INT8_t*    y,
                                 SIZE_t     remove_index,
                                 Feature*** features_ptr,
                                 SIZE_t*    n_features_ptr) nogil
@@ -48,7 +49,7 @@ cdef class _Simulator:
     cdef SIZE_t update_greedy_node_metadata(self,
                                             Node*      node,
                                             DTYPE_t**  X,
-                                            INT32_t*   y,
+                                            INT8_t*    y,
                                             SIZE_t     remove_index,
                                             Feature*** features_ptr,
                                             SIZE_t*    n_features_ptr) nogil
@@ -56,7 +57,7 @@ cdef class _Simulator:
     cdef SIZE_t update_random_node_metadata(self,
                                             Node*     node,
                                             DTYPE_t** X,
-                                            INT32_t*  y,
+                                            INT8_t*   y,
                                             SIZE_t    remove_index) nogil
 
 # helper methods
@@ -69,8 +70,8 @@ cdef SIZE_t sample_new_thresholds(Feature*  feature,
                                   SIZE_t*   threshold_validities,
                                   Node*     node,
                                   DTYPE_t** X,
-                                  INT32_t*  y,
-                                  SIZE_t    remove_index,
+                                  INT8_t*   y,
+                                  IntList*  samples,
                                   bint*     is_constant_feature_ptr,
                                   _Config   config) nogil
 
@@ -80,8 +81,8 @@ cdef SIZE_t sample_new_features(Feature*** features_ptr,
                                 SIZE_t     n_total_features,
                                 Node*      node,
                                 DTYPE_t**  X,
-                                INT32_t*   y,
-                                SIZE_t     remove_index,
+                                INT8_t*    y,
+                                IntList*   samples,
                                 _Config    config) nogil
 
 cdef void get_leaf_samples(Node*    node,
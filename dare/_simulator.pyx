@@ -10,6 +10,7 @@ from cpython.ref cimport PyObject
 cimport cython
 
 from libc.stdlib cimport free
+from libc.stdlib cimport calloc
 from libc.stdlib cimport malloc
 from libc.stdlib cimport realloc
 from libc.stdio cimport printf
@@ -81,7 +82,7 @@ cdef class _Simulator:
 
         # Data containers
         cdef DTYPE_t** X = NULL
-        cdef INT32_t*  y = NULL
+        cdef INT8_t*   y = NULL
         self.manager.get_data(&X, &y)
 
         # check if any sample has already been deleted
@@ -103,7 +104,7 @@ cdef class _Simulator:
     cdef INT32_t _sim_delete(self,
                              Node*     node,
                              DTYPE_t** X,
-                             INT32_t*  y,
+                             INT8_t*   y,
                              SIZE_t    remove_index) nogil:
         """
         Traverse tree until a stopping criterion is reached.
@@ -176,7 +177,7 @@ cdef class _Simulator:
                 else:
 
                     # traverse left if deleted sample goes left
-                    if X[remove_index][node.chosen_feature.index] <= node.chosen_threshold.value:
+                    if X[node.chosen_feature.index][remove_index] <= node.chosen_threshold.value:
                         return self._sim_delete(node.left, X, y, remove_index)
 
                     # traverse right if deleted sample goes right
@@ -266,7 +267,7 @@ cdef class _Simulator:
     cdef SIZE_t update_metadata(self,
                                 Node*      node,
                                 DTYPE_t**  X,
-                                INT32_t*   y,
+                                INT8_t*    y,
                                 SIZE_t     remove_index,
                                 Feature*** features_ptr,
                                 SIZE_t*    n_features_ptr) nogil:
@@ -291,7 +292,7 @@ cdef class _Simulator:
     cdef SIZE_t update_greedy_node_metadata(self,
                                             Node*      node,
                                             DTYPE_t**  X,
-                                            INT32_t*   y,
+                                            INT8_t*    y,
                                             SIZE_t     remove_index,
                                             Feature*** features_ptr,
                                             SIZE_t*    n_features_ptr) nogil:
@@ -324,6 +325,9 @@ cdef class _Simulator:
         # invalid features
         cdef IntList* invalid_features = create_intlist(node.n_features, 0)
 
+        # updated samples for this node, gathered at most once when resampling is needed
+        cdef IntList* samples = NULL
+
         # return variable
         cdef SIZE_t    n_usable_thresholds = 0
         cdef Feature** features = features_ptr[0]
@@ -350,7 +354,7 @@ cdef class _Simulator:
                 threshold = feature.thresholds[k]
 
                 # decrement left branch of this threshold
-                if X[remove_index][feature.index] <= threshold.value:
+                if X[feature.index][remove_index] <= threshold.value:
                     threshold.n_left_samples -= 1
                     threshold.n_left_pos_samples -= y[remove_index]
 
@@ -360,12 +364,12 @@ cdef class _Simulator:
                     threshold.n_right_pos_samples -= y[remove_index]
 
                 # decrement left value of this threshold
-                if X[remove_index][feature.index] == threshold.v1:
+                if X[feature.index][remove_index] == threshold.v1:
                     threshold.n_v1_samples -= 1
                     threshold.n_v1_pos_samples -= y[remove_index]
 
                 # decrement right value of this threshold
-                elif X[remove_index][feature.index] == threshold.v2:
+                elif X[feature.index][remove_index] == threshold.v2:
                     threshold.n_v2_samples -= 1
                     threshold.n_v2_pos_samples -= y[remove_index]
 
@@ -393,6 +397,8 @@ cdef class _Simulator:
                         # clean up
                         free(threshold_validities)
                         free_intlist(invalid_features)
+                        if samples != NULL:
+                            free_intlist(samples)
                         return -1
 
                 # valid threshold
@@ -421,9 +427,13 @@ cdef class _Simulator:
                 # possibly other thresholds, sample new thresholds for this feature
                 else:
                     # printf('[R - UGNM] possibly other thresholds, sample new thresholds\n')
+                    if samples == NULL:
+                        samples = create_intlist(node.n_samples, 0)
+                        get_leaf_samples(node, remove_index, samples)
+
                     n_new_thresholds = sample_new_thresholds(feature, n_valid_thresholds,
                                                              threshold_validities, node, X, y,
-                                                             remove_index, NULL, self.config)
+                                                             samples, NULL, self.config)
 
                     # all thresholds invalid, flag feature for replacement
                     if n_new_thresholds == 0 and n_valid_thresholds == 0:
@@ -440,9 +450,13 @@ cdef class _Simulator:
         # replace invalid features
         # printf('[R - UGNM] invalid_features.n: %ld\n', invalid_features.n)
         if invalid_features.n > 0:
+            if samples == NULL:
+                samples = create_intlist(node.n_samples, 0)
+                get_leaf_samples(node, remove_index, samples)
+
             n_usable_thresholds += sample_new_features(features_ptr, n_features_ptr,
                                                        invalid_features, n_total_features,
-                                                       node, X, y, remove_index, self.config)
+                                                       node, X, y, samples, self.config)
 
             # printf('[R - UGNM] n_features_ptr[0]: %ld\n', n_features_ptr[0])
 
@@ -452,13 +466,15 @@ cdef class _Simulator:
 
         # clean up
         free_intlist(invalid_features)
+        if samples != NULL:
+            free_intlist(samples)
 
         return n_usable_thresholds
 
     cdef SIZE_t update_random_node_metadata(self,
                                             Node*     node,
                                             DTYPE_t** X,
-                                            INT32_t*  y,
+                                            INT8_t*   y,
                                             SIZE_t    remove_index) nogil:
         """
         Update the metadata for the chosen feature / threshold of the
@@ -476,7 +492,7 @@ cdef class _Simulator:
         cdef SIZE_t n_usable_thresholds = 1
 
         # decrement left branch sample count
-        if X[remove_index][node.chosen_feature.index] <= node.chosen_threshold.value:
+        if X[node.chosen_feature.index][remove_index] <= node.chosen_threshold.value:
             chosen_threshold_n_left_samples -= 1
 
         # decrement right branch sample count
@@ -528,12 +544,14 @@ cdef SIZE_t sample_new_thresholds(Feature*  feature,
                                   SIZE_t*   threshold_validities,
                                   Node*     node,
                                   DTYPE_t** X,
-                                  INT32_t*  y,
-                                  SIZE_t    remove_index,
+                                  INT8_t*   y,
+                                  IntList*  samples,
                                   bint*     is_constant_feature_ptr,
                                   _Config   config) nogil:
     """
     Try to sample new thresholds for all invalid thresholds for this feature.
+
+    NOTE: `samples` are the updated samples of this node, gathered by the caller.
     """
 
     # configuration
@@ -549,7 +567,7 @@ cdef SIZE_t sample_new_thresholds(Feature*  feature,
     cdef INT32_t ndx = 0
 
     # candidate threshold variables
-    cdef Threshold** candidate_thresholds = NULL
+    cdef Threshold*  candidate_thresholds = NULL
     cdef SIZE_t      n_candidate_thresholds = 0
 
     # unused candidate threshold array variables
@@ -569,19 +587,15 @@ cdef SIZE_t sample_new_thresholds(Feature*  feature,
     # return variable
     cdef SIZE_t n_usable_thresholds = 0
 
-    # get updated samples for this node
-    cdef IntList* samples = create_intlist(node.n_samples, 0)
-    get_leaf_samples(node, remove_index, samples)
-
     # helper variables
     cdef DTYPE_t* values = <DTYPE_t *>malloc(samples.n * sizeof(DTYPE_t))
-    cdef INT32_t* labels = <INT32_t *>malloc(samples.n * sizeof(INT32_t))
+    cdef INT8_t*  labels = <INT8_t *>malloc(samples.n * sizeof(INT8_t))
     cdef SIZE_t*  indices = <SIZE_t *>malloc(samples.n * sizeof(SIZE_t))
     cdef SIZE_t   n_pos_samples = 0
 
     # copy values and labels into new arrays, and count no. pos. labels
     for i in range(samples.n):
-        values[i] = X[samples.arr[i]][feature.index]
+        values[i] = X[feature.index][samples.arr[i]]
         labels[i] = y[samples.arr[i]]
         indices[i] = i
         n_pos_samples += y[samples.arr[i]]
@@ -595,10 +609,10 @@ cdef SIZE_t sample_new_thresholds(Feature*  feature,
             is_constant_feature_ptr[0] = True
 
     # get candidate thresholds
-    candidate_thresholds = <Threshold **>malloc(samples.n * sizeof(Threshold *))
+    candidate_thresholds = <Threshold *>malloc(samples.n * sizeof(Threshold))
     n_candidate_thresholds = get_candidate_thresholds(values, labels, indices,
                                                       samples.n, n_pos_samples,
-                                                      min_samples_leaf, &candidate_thresholds)
+                                                      min_samples_leaf, candidate_thresholds)
 
     # array of candidate thresholds that are not being used
     unused_thresholds = <Threshold **>malloc(n_candidate_thresholds * sizeof(Threshold *))
@@ -616,7 +630,7 @@ cdef SIZE_t sample_new_thresholds(Feature*  feature,
 
         # add candidate threshold to list of unused candidate thresholds
         if not used:
-            unused_thresholds[n_unused_thresholds] = candidate_thresholds[i]
+            unused_thresholds[n_unused_thresholds] = &candidate_thresholds[i]
             n_unused_thresholds += 1
 
     # compute number of unused thresholds to sample
@@ -662,14 +676,13 @@ cdef SIZE_t sample_new_thresholds(Feature*  feature,
 
     # free previous thresholds and candidate thresholds arrays
     free_thresholds(feature.thresholds, feature.n_thresholds)
-    free_thresholds(candidate_thresholds, n_candidate_thresholds)
+    free(candidate_thresholds)
 
     # clean up
     free(values)
     free(labels)
     free(indices)
     free(unused_thresholds)
-    free_intlist(samples)
     free_intlist(sampled_indices)
 
     # set new thresholds array for this feature
@@ -684,8 +697,8 @@ cdef SIZE_t sample_new_features(Feature*** features_ptr,
                                 SIZE_t     n_total_features,
                                 Node*      node,
                                 DTYPE_t**  X,
-                                INT32_t*   y,
-                                SIZE_t     remove_index,
+                                INT8_t*    y,
+                                IntList*   samples,
                                 _Config    config) nogil:
     """
     Sample new unused features to replace the invalid features.
@@ -708,6 +721,7 @@ cdef SIZE_t sample_new_features(Feature*** features_ptr,
     # keeps track of invalid features
     cdef IntList* constant_features = copy_intlist(node.constant_features, n_total_features)
     cdef IntList* sampled_features = create_intlist(n_total_features, 0)
+    cdef bint*    is_invalid_feature = NULL
     cdef SIZE_t   n_features = node.n_features - invalid_features.n
     cdef bint     is_constant_feature = False
     cdef bint     valid = False
@@ -733,33 +747,26 @@ cdef SIZE_t sample_new_features(Feature*** features_ptr,
     # for i in range(sampled_features.n):
         # printf('[S - SNF] sampled_features.arr[%ld]: %ld\n', i, sampled_features.arr[i])
 
+    # flag sampled and known constant features for constant-time lookups
+    is_invalid_feature = <bint *>calloc(n_total_features, sizeof(bint))
+    for i in range(sampled_features.n):
+        is_invalid_feature[sampled_features.arr[i]] = True
+    for i in range(constant_features.n):
+        is_invalid_feature[constant_features.arr[i]] = True
+
     # sample features until the previous no. features is reached or there are no features left
     while n_features < node.n_features and (sampled_features.n + constant_features.n) < n_total_features:
 
         # sample feature index
         feature_index = rand_int(0, n_total_features, random_state)
 
-        # already sampled feature
-        valid = True
-        for i in range(sampled_features.n):
-            if sampled_features.arr[i] == feature_index:
-                valid = False
-                break
-        if not valid:
-            continue
-
-        # known constant feature
-        valid = True
-        for i in range(constant_features.n):
-            if constant_features.arr[i] == feature_index:
-                valid = False
-                break
-        if not valid:
+        # already sampled or known constant feature
+        if is_invalid_feature[feature_index]:
             continue
 
         # create a feature and sample thresholds
         feature = create_feature(feature_index)
-        sample_new_thresholds(feature, 0, NULL, node, X, y, remove_index, &is_constant_feature, config)
+        sample_new_thresholds(feature, 0, NULL, node, X, y, samples, &is_constant_feature, config)
 
         # printf('[R - SNF] is_constant_feature: %d\n', is_constant_feature)
 
@@ -767,12 +774,14 @@ cdef SIZE_t sample_new_features(Feature*** features_ptr,
         if is_constant_feature:
             constant_features.arr[constant_features.n] = feature_index
             constant_features.n += 1
+            is_invalid_feature[feature_index] = True
             free_feature(feature)
             continue
 
         # add to sampled features array
         sampled_features.arr[sampled_features.n] = feature_index
         sampled_features.n += 1
+        is_invalid_feature[feature_index] = True
 
         # no valid thresholds, free feature and sample a new feature
         if feature.n_thresholds == 0:
@@ -829,6 +838,7 @@ cdef SIZE_t sample_new_features(Feature*** features_ptr,
 
     # clean up
     free_intlist(sampled_features)
+    free(is_invalid_feature)
     free_intlist(constant_features)
 
     return n_usable_thresholds
@@ -837,30 +847,47 @@ cdef void get_leaf_samples(Node*    node,
                            SIZE_t   remove_index,
                            IntList* leaf_samples) nogil:
     """
-    Recursively obtain the samples at the leaves and filter out deleted sample.
+    Obtain the samples at the leaves and filter out deleted sample.
+
+    Traverses the subtree with an explicit stack, visiting the leaves
+    from left to right.
     """
-    cdef bint   add_sample = True
     cdef SIZE_t i = 0
-    cdef SIZE_t j = 0
 
-    # leaf
-    if node.is_leaf:
+    # stack of nodes left to visit
+    cdef SIZE_t stack_capacity = 64
+    cdef SIZE_t stack_n = 1
+    cdef Node** stack = <Node **>malloc(stack_capacity * sizeof(Node *))
+    stack[0] = node
+
+    while stack_n > 0:
+        stack_n -= 1
+        node = stack[stack_n]
 
-        # loop through all samples at this leaf
-        for i in range(node.n_samples):
+        # leaf
+        if node.is_leaf:
 
-            # add sample to results if it has not been deleted
-            if node.leaf_samples[i] != remove_index:
-                leaf_samples.arr[leaf_samples.n] = node.leaf_samples[i]
-                leaf_samples.n += 1
+            # loop through all samples at this leaf
+            for i in range(node.n_samples):
 
-    # decision node
-    else:
+                # add sample to results if it has not been deleted
+                if node.leaf_samples[i] != remove_index:
+                    leaf_samples.arr[leaf_samples.n] = node.leaf_samples[i]
+                    leaf_samples.n += 1
+
+        # decision node, push right first so the left branch is visited first
+        else:
+
+            if stack_n + 2 > stack_capacity:
+                stack_capacity *= 2
+                stack = <Node **>realloc(stack, stack_capacity * sizeof(Node *))
+
+            if node.right:
+                stack[stack_n] = node.right
+                stack_n += 1
 
-        # traverse left
-        if node.left:
-            get_leaf_samples(node.left, remove_index, leaf_samples)
+            if node.left:
+                stack[stack_n] = node.left
+                stack_n += 1
 
-        # traverse right
-        if node.right:
-            get_leaf_samples(node.right, remove_index, leaf_samples)
+    free(stack)
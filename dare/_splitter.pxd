@@ -5,6 +5,7 @@ from ._tree cimport IntList
 from ._config cimport _Config
 from ._utils cimport DTYPE_t
 from ._utils cimport SIZE_t
+from ._utils cimport INT8_t
 from ._utils cimport INT32_t
 from ._utils cimport UINT32_t
 
@@ -17,6 +18,8 @@ cdef struct SplitRecord:
     IntList* right_samples                 # Samples in right branch of feature
     IntList* left_constant_features        # Samples in left branch of feature
     IntList* right_constant_features       # Samples in right branch of feature
+    SIZE_t   n_left_pos_samples            # No. pos. samples in left branch of feature
+    SIZE_t   n_right_pos_samples           # No. pos. samples in right branch of feature
 
 cdef class _Splitter:
     """
@@ -30,14 +33,14 @@ cdef class _Splitter:
     cdef SIZE_t select_threshold(self,
                                  Node*        node,
                                  DTYPE_t**    X,
-                                 INT32_t*     y,
+                                 INT8_t*      y,
                                  IntList*     samples,
                                  SIZE_t       n_total_features) nogil
 
 # Helper methods
 cdef SIZE_t select_greedy_threshold(Node*     node,
                                     DTYPE_t** X,
-                                    INT32_t*  y,
+                                    INT8_t*   y,
                                     IntList* samples,
                                     SIZE_t    n_total_features,
                                     _Config   config) nogil
@@ -49,9 +52,9 @@ cdef SIZE_t select_random_threshold(Node*     node,
                                     _Config   config) nogil
 
 cdef SIZE_t get_candidate_thresholds(DTYPE_t*     values,
-                                     INT32_t*     labels,
+                                     INT8_t*      labels,
                                      SIZE_t*      indices,
                                      SIZE_t       n_samples,
                                      SIZE_t       n_pos_samples,
                                      SIZE_t       min_samples_leaf,
-                                     Threshold*** thresholds_ptr) nogil
+                                     Threshold*   thresholds) nogil
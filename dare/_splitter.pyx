@@ -5,6 +5,7 @@
 Splits the data into separate partitions.
 """
 from libc.stdlib cimport free
+from libc.stdlib cimport calloc
 from libc.stdlib cimport malloc
 from libc.stdlib cimport realloc
 from libc.stdio cimport printf
@@ -47,7 +48,7 @@ cdef class _Splitter:
     cdef SIZE_t select_threshold(self,
                                  Node*        node,
                                  DTYPE_t**    X,
-                                 INT32_t*     y,
+                                 INT8_t*      y,
                                  IntList*     samples,
                                  SIZE_t       n_total_features) nogil:
         """
@@ -68,7 +69,7 @@ cdef class _Splitter:
 
 cdef SIZE_t select_greedy_threshold(Node*     node,
                                     DTYPE_t** X,
-                                    INT32_t*  y,
+                                    INT8_t*   y,
                                     IntList*  samples,
                                     SIZE_t    n_total_features,
                                     _Config   config) nogil:
@@ -106,19 +107,20 @@ cdef SIZE_t select_greedy_threshold(Node*     node,
     # container variables
     cdef Feature*    feature = NULL
     cdef Threshold*  threshold = NULL
-    cdef Threshold** candidate_thresholds = NULL
+    cdef Threshold*  candidate_thresholds = NULL
     cdef SIZE_t      n_candidate_thresholds = 0
     cdef SIZE_t      n_candidate_thresholds_to_sample = 0
 
     # helper arrays
     cdef DTYPE_t* values = <DTYPE_t *>malloc(samples.n * sizeof(DTYPE_t))
-    cdef INT32_t* labels = <INT32_t *>malloc(samples.n * sizeof(INT32_t))
+    cdef INT8_t*  labels = <INT8_t *>malloc(samples.n * sizeof(INT8_t))
     cdef SIZE_t*  indices = <SIZE_t *>malloc(samples.n * sizeof(SIZE_t))
-    cdef SIZE_t   n_pos_samples = 0
+    cdef SIZE_t   n_pos_samples = node.n_pos_samples
 
     # variables for tracking
     cdef IntList*    constant_features = NULL
     cdef IntList*    sampled_features = NULL
+    cdef bint*       is_invalid_feature = NULL
     cdef IntList*    sampled_indices = NULL
     cdef Threshold** sampled_thresholds = NULL
     cdef bint        valid = True
@@ -132,10 +134,9 @@ cdef SIZE_t select_greedy_threshold(Node*     node,
     # return variable
     cdef SIZE_t n_usable_thresholds = 0
 
-    # compute no. pos. samples
+    # gather labels, no. pos. samples is already known from the node
     for i in range(samples.n):
         labels[i] = y[samples.arr[i]]
-        n_pos_samples += y[samples.arr[i]]
 
     # allocate memory for a features array
     if n_total_features < max_features:
@@ -146,35 +147,33 @@ cdef SIZE_t select_greedy_threshold(Node*     node,
     constant_features = copy_intlist(node.constant_features, n_total_features)
     sampled_features = create_intlist(n_total_features, 0)
 
+    # flag known constant features for constant-time lookups
+    is_invalid_feature = <bint *>calloc(n_total_features, sizeof(bint))
+    for i in range(constant_features.n):
+        is_invalid_feature[constant_features.arr[i]] = True
+
+    # scratch buffers reused by every sampled feature at this node
+    candidate_thresholds = <Threshold *>malloc(samples.n * sizeof(Threshold))
+    if k_samples < samples.n:
+        sampled_indices = create_intlist(k_samples, 0)
+    else:
+        sampled_indices = create_intlist(samples.n, 0)
+
     # sample features until `max_features` is reached or there are no features left
     while n_features < max_features and (sampled_features.n + constant_features.n) < n_total_features:
 
         # sample feature index
         feature_index = rand_int(0, n_total_features, random_state)
 
-        # already sampled feature
-        valid = True
-        for i in range(sampled_features.n):
-            if sampled_features.arr[i] == feature_index:
-                valid = False
-                break
-        if not valid:
-            continue
-
-        # known constant feature
-        valid = True
-        for i in range(constant_features.n):
-            if constant_features.arr[i] == feature_index:
-                valid = False
-                break
-        if not valid:
+        # already sampled or known constant feature
+        if is_invalid_feature[feature_index]:
             continue
 
         # printf('[S - SGT] feature_index: %d\n', feature_index)
 
         # copy values and labels into new arrays, and count no. pos. labels
         for i in range(samples.n):
-            values[i] = X[samples.arr[i]][feature_index]
+            values[i] = X[feature_index][samples.arr[i]]
             indices[i] = i
 
         # sort feature values, and their corresponding indices
@@ -184,20 +183,21 @@ cdef SIZE_t select_greedy_threshold(Node*     node,
         if values[samples.n - 1] <= values[0] + FEATURE_THRESHOLD:
             constant_features.arr[constant_features.n] = feature_index
             constant_features.n += 1
+            is_invalid_feature[feature_index] = True
             continue
 
         # add feature index to list of sampled features
         else:
             sampled_features.arr[sampled_features.n] = feature_index
             sampled_features.n += 1
+            is_invalid_feature[feature_index] = True
 
         # get candidate thresholds for this feature
-        candidate_thresholds = <Threshold **>malloc(samples.n * sizeof(Threshold *))
         n_candidate_thresholds = get_candidate_thresholds(values, labels, indices, samples.n,
                                                           n_pos_samples, min_samples_leaf,
-                                                          &candidate_thresholds)
+                                                          candidate_thresholds)
 
-        # no valid thresholds, candidate thresholds is freed in the method
+        # no valid thresholds
         if n_candidate_thresholds == 0:
             continue
 
@@ -220,7 +220,7 @@ cdef SIZE_t select_greedy_threshold(Node*     node,
 
         # create new (smaller) thresholds array
         final_thresholds = <Threshold **>malloc(n_candidate_thresholds_to_sample * sizeof(Threshold *))
-        sampled_indices = create_intlist(n_candidate_thresholds_to_sample, 0)
+        sampled_indices.n = 0
 
         # sample threshold indices uniformly at random
         while sampled_indices.n < n_candidate_thresholds_to_sample:
@@ -239,7 +239,7 @@ cdef SIZE_t select_greedy_threshold(Node*     node,
             if valid:
 
                 # add copied threshold to thresholds array
-                threshold = copy_threshold(candidate_thresholds[ndx])
+                threshold = copy_threshold(&candidate_thresholds[ndx])
                 final_thresholds[sampled_indices.n] = threshold
                 sampled_indices.arr[sampled_indices.n] = ndx
                 sampled_indices.n += 1
@@ -273,14 +273,6 @@ cdef SIZE_t select_greedy_threshold(Node*     node,
         features[n_features] = feature
         n_features += 1
 
-        # free candidate thresholds array
-        for i in range(n_candidate_thresholds):
-            free(candidate_thresholds[i])
-        free(candidate_thresholds)
-
-        # free sampled indices array
-        free_intlist(sampled_indices)
-
     # free previous constant features array
     free_intlist(node.constant_features)
 
@@ -306,7 +298,10 @@ cdef SIZE_t select_greedy_threshold(Node*     node,
     free(values)
     free(labels)
     free(indices)
+    free(candidate_thresholds)
+    free_intlist(sampled_indices)
     free_intlist(sampled_features)
+    free(is_invalid_feature)
 
     return n_usable_thresholds
 
@@ -338,6 +333,7 @@ cdef SIZE_t select_random_threshold(Node*     node,
     # arrays to keep track of invalid features
     cdef IntList* constant_features = copy_intlist(node.constant_features, n_total_features)
     cdef IntList* sampled_features = create_intlist(n_total_features, 0)
+    cdef bint*    is_invalid_feature = NULL
 
     # feature / threshold information
     cdef Feature*   feature = NULL
@@ -352,36 +348,27 @@ cdef SIZE_t select_random_threshold(Node*     node,
     # return variable
     cdef SIZE_t n_usable_thresholds = 0
 
+    # flag known constant features for constant-time lookups
+    is_invalid_feature = <bint *>calloc(n_total_features, sizeof(bint))
+    for i in range(constant_features.n):
+        is_invalid_feature[constant_features.arr[i]] = True
+
     # sample features until a valid one is found or there are no more features
     while sampled_features.n + constant_features.n < n_total_features:
 
         # sample feature index
         feature_index = rand_int(0, n_total_features, random_state)
 
-        # check if feature has already been sampled
-        valid = True
-        for i in range(sampled_features.n):
-            if sampled_features.arr[i] == feature_index:
-                valid = False
-                break
-        if not valid:
-            continue
-
-        # check if feature is a known constant
-        valid = True
-        for i in range(constant_features.n):
-            if constant_features.arr[i] == feature_index:
-                valid = False
-                break
-        if not valid:
+        # already sampled or known constant feature
+        if is_invalid_feature[feature_index]:
             continue
 
         # find min. max. values, and their counts
-        min_val = X[samples.arr[0]][feature_index]
+        min_val = X[feature_index][samples.arr[0]]
         max_val = min_val
 
         for i in range(samples.n):
-            cur_val = X[samples.arr[i]][feature_index]
+            cur_val = X[feature_index][samples.arr[i]]
 
             if cur_val < min_val:
                 min_val = cur_val
@@ -393,6 +380,7 @@ cdef SIZE_t select_random_threshold(Node*     node,
         if max_val <= min_val + FEATURE_THRESHOLD:
             constant_features.arr[constant_features.n] = feature_index
             constant_features.n += 1
+            is_invalid_feature[feature_index] = True
 
         # non-constant feature
         else:
@@ -400,24 +388,19 @@ cdef SIZE_t select_random_threshold(Node*     node,
             # add feature to list of sampled features
             sampled_features.arr[sampled_features.n] = feature_index
             sampled_features.n += 1
+            is_invalid_feature[feature_index] = True
 
             # keep randomly sampling until a valid threshold is found
             threshold_value = <DTYPE_t>rand_uniform(min_val, max_val, random_state)
             while threshold_value >= max_val or threshold_value < min_val:
                 threshold_value = <DTYPE_t>rand_uniform(min_val, max_val, random_state)
 
-            # make sure the min. no. samples is met for both branches
+            # make sure the min. no. samples is met for both branches,
+            # counting without a data-dependent branch
             n_left_samples = 0
-            n_right_samples = 0
-
             for i in range(samples.n):
-
-                # increment sample count for left or right branch
-                if X[samples.arr[i]][feature_index] <= threshold_value:
-                    n_left_samples += 1
-
-                else:
-                    n_right_samples += 1
+                n_left_samples += X[feature_index][samples.arr[i]] <= threshold_value
+            n_right_samples = samples.n - n_left_samples
 
             # free previous constant thresholds array
             free_intlist(node.constant_features)
@@ -439,17 +422,18 @@ cdef SIZE_t select_random_threshold(Node*     node,
 
     # clean up
     free_intlist(sampled_features)
+    free(is_invalid_feature)
 
     return n_usable_thresholds
 
 
 cdef SIZE_t get_candidate_thresholds(DTYPE_t*     values,
-                                     INT32_t*     labels,
+                                     INT8_t*      labels,
                                      SIZE_t*      indices,
                                      SIZE_t       n_samples,
                                      SIZE_t       n_pos_samples,
                                      SIZE_t       min_samples_leaf,
-                                     Threshold*** thresholds_ptr) nogil:
+                                     Threshold*   thresholds) nogil:
     """
     For this feature:
 
@@ -458,6 +442,12 @@ cdef SIZE_t get_candidate_thresholds(DTYPE_t*     values,
         ->Reference: https://www.biostat.wisc.edu/~page/decision-trees.pdf
       -Save metadata for each threshold.
 
+    Adjacent feature value sets are evaluated in a single pass over the
+    sorted values, as soon as the upper value set is complete.
+
+    Candidates are written into the caller-provided `thresholds` array,
+    which must hold at least `n_samples` elements.
+
     NOTE: values and indices were sorted together, labels was not!
     """
 
@@ -469,33 +459,18 @@ cdef SIZE_t get_candidate_thresholds(DTYPE_t*     values,
 
     # keep track of the current feature set
     cdef DTYPE_t prev_val = values[0]
-    cdef DTYPE_t cur_val = 0
-    cdef INT32_t cur_label = 0
-
-    # containers to hold feature value set information
-    cdef DTYPE_t* threshold_values = <DTYPE_t *>malloc(n_samples * sizeof(DTYPE_t))
-    cdef SIZE_t*  counts = <SIZE_t *>malloc(n_samples * sizeof(SIZE_t))
-    cdef SIZE_t*  pos_counts = <SIZE_t *>malloc(n_samples * sizeof(SIZE_t))
-    cdef SIZE_t*  v_counts = <SIZE_t *>malloc(n_samples * sizeof(SIZE_t))
-    cdef SIZE_t*  v_pos_counts = <SIZE_t *>malloc(n_samples * sizeof(SIZE_t))
 
     # iterators
     cdef SIZE_t  i = 0
-    cdef SIZE_t  k = 0
 
     # intermediate variables
     cdef DTYPE_t v1_label_ratio = 0
     cdef DTYPE_t v2_label_ratio = 0
-    cdef bint    save_threshold = False
 
-    # threshold info to save
-    cdef DTYPE_t value = 0
+    # threshold info to save, the lower value set is carried over from the previous set
     cdef DTYPE_t v1 = 0
-    cdef DTYPE_t v2 = 0
     cdef SIZE_t  n_v1_samples = 0
     cdef SIZE_t  n_v1_pos_samples = 0
-    cdef SIZE_t  n_v2_samples = 0
-    cdef SIZE_t  n_v2_pos_samples = 0
     cdef SIZE_t  n_left_samples = 0
     cdef SIZE_t  n_left_pos_samples = 0
     cdef SIZE_t  n_right_samples = 0
@@ -506,116 +481,66 @@ cdef SIZE_t get_candidate_thresholds(DTYPE_t*     values,
     cdef SIZE_t thresholds_count = 0
 
     # object pointers
-    cdef Threshold*  threshold = NULL
-    cdef Threshold** thresholds = thresholds_ptr[0]
+    cdef Threshold* threshold = NULL
 
-    # save statistics about each adjacent feature value
-    for i in range(1, n_samples):
-        cur_val = values[i]
-        cur_label = labels[indices[i]]
+    # the extra iteration (i == n_samples) completes the last feature value set
+    for i in range(1, n_samples + 1):
 
         # same feature, increment counts
         # if fabs(cur_val - prev_val) <= FEATURE_THRESHOLD:
-        if cur_val <= prev_val + FEATURE_THRESHOLD:
-            # printf('[S - GCT] %.32f, %.32f\n', cur_val, prev_val)
-            # printf('[S - GCT] %.32f <= %.32f\n', fabs(cur_val - prev_val), FEATURE_THRESHOLD)
+        if i < n_samples and values[i] <= prev_val + FEATURE_THRESHOLD:
             v_count += 1
-            v_pos_count += cur_label
+            v_pos_count += labels[indices[i]]
 
-        # next feature:
+        # feature value set is complete
         else:
 
-            # save previous feature counts
-            threshold_values[feature_value_count] = prev_val
-            counts[feature_value_count] = count
-            pos_counts[feature_value_count] = pos_count
-            v_counts[feature_value_count] = v_count
-            v_pos_counts[feature_value_count] = v_pos_count
+            # evaluate the threshold between the previous and this feature value set
+            if feature_value_count > 0:
+                n_right_samples = n_samples - n_left_samples
+                n_right_pos_samples = n_pos_samples - n_left_pos_samples
+
+                # compute label ratios of the two groups
+                v1_label_ratio = n_v1_pos_samples / (1.0 * n_v1_samples)
+                v2_label_ratio = v_pos_count / (1.0 * v_count)
+
+                # enough samples in each branch and a valid threshold
+                if (n_left_samples >= min_samples_leaf and n_right_samples >= min_samples_leaf and
+                    ((v1_label_ratio != v2_label_ratio) or
+                     (v1_label_ratio > 0.0 and v2_label_ratio < 1.0))):
+
+                    # save threshold to the candidate array
+                    threshold = &thresholds[thresholds_count]
+                    threshold.v1 = v1
+                    threshold.v2 = prev_val
+                    threshold.value = v1
+                    threshold.n_v1_samples = n_v1_samples
+                    threshold.n_v1_pos_samples = n_v1_pos_samples
+                    threshold.n_v2_samples = v_count
+                    threshold.n_v2_pos_samples = v_pos_count
+                    threshold.n_left_samples = n_left_samples
+                    threshold.n_left_pos_samples = n_left_pos_samples
+                    threshold.n_right_samples = n_right_samples
+                    threshold.n_right_pos_samples = n_right_pos_samples
+                    thresholds_count += 1
+
+            # this feature value set becomes the lower set of the next threshold
+            v1 = prev_val
+            n_v1_samples = v_count
+            n_v1_pos_samples = v_pos_count
+            n_left_samples = count
+            n_left_pos_samples = pos_count
             feature_value_count += 1
 
-            # reset counts for this new feature
-            v_count = 1
-            v_pos_count = cur_label
-
-        # increment left branch counts
-        count += 1
-        pos_count += cur_label
-
-        # move pointers to the next feature
-        prev_val = cur_val
-
-    # handle last feature value
-    if v_count > 0:
-
-        # save previous feature counts
-        threshold_values[feature_value_count] = prev_val
-        counts[feature_value_count] = count
-        pos_counts[feature_value_count] = pos_count
-        v_counts[feature_value_count] = v_count
-        v_pos_counts[feature_value_count] = v_pos_count
-        feature_value_count += 1
-
-    # evaluate adjacent pairs of feature sets to get candidate thresholds
-    for k in range(1, feature_value_count):
-
-        # extract both of the feature set counts
-        v1 = threshold_values[k-1]
-        v2 = threshold_values[k]
-        n_v1_samples = v_counts[k-1]
-        n_v2_samples = v_counts[k]
-        n_v1_pos_samples = v_pos_counts[k-1]
-        n_v2_pos_samples = v_pos_counts[k]
-        n_left_samples = counts[k-1]
-        n_left_pos_samples = pos_counts[k-1]
-        n_right_samples = n_samples - n_left_samples
-        n_right_pos_samples = n_pos_samples - n_left_pos_samples
-
-        # if n_left_samples < min_samples_leaf or n_right_samples < min_samples_leaf:
-        #     printf('[S - GCT] NO LEFT OR RIGHT SAMPLES\n')
-
-        # not enough samples in each branch
-        if n_left_samples < min_samples_leaf or n_right_samples < min_samples_leaf:
-            continue
+            # reset counts for the next feature value set
+            if i < n_samples:
+                v_count = 1
+                v_pos_count = labels[indices[i]]
 
-        # compute label ratios of the two groups
-        v1_label_ratio = n_v1_pos_samples / (1.0 * n_v1_samples)
-        v2_label_ratio = n_v2_pos_samples / (1.0 * n_v2_samples)
-
-        # valid threshold
-        if ((v1_label_ratio != v2_label_ratio) or
-            (v1_label_ratio > 0.0 and v2_label_ratio < 1.0)):
-
-            # create threshold
-            threshold = <Threshold *>malloc(sizeof(Threshold))
-            threshold.v1 = v1
-            threshold.v2 = v2
-            threshold.value = v1
-            threshold.n_v1_samples = n_v1_samples
-            threshold.n_v1_pos_samples = n_v1_pos_samples
-            threshold.n_v2_samples = n_v2_samples
-            threshold.n_v2_pos_samples = n_v2_pos_samples
-            threshold.n_left_samples = n_left_samples
-            threshold.n_left_pos_samples = n_left_pos_samples
-            threshold.n_right_samples = n_right_samples
-            threshold.n_right_pos_samples = n_right_pos_samples
-
-            # printf('[S - GCT] v1: %.5f, v2: %.5f, v1 + v2: %.5f, threshold.value: %.5f\n',
-            #        v1, v2, v2 + v1, threshold.value)
-
-            # save threshold to thresholds array
-            thresholds[thresholds_count] = threshold
-            thresholds_count += 1
-
-    # if no viable thresholds, free thresholds array container
-    if thresholds_count == 0:
-        free(thresholds)
-        thresholds_ptr[0] = NULL
-
-    # clean up
-    free(threshold_values)
-    free(counts)
-    free(pos_counts)
-    free(v_counts)
-    free(v_pos_counts)
+        # increment left branch counts, and move pointers to the next feature
+        if i < n_samples:
+            count += 1
+            pos_count += labels[indices[i]]
+            prev_val = values[i]
 
     return thresholds_count
@@ -7,6 +7,7 @@ from ._splitter cimport _Splitter
 from ._config cimport _Config
 from ._utils cimport DTYPE_t
 from ._utils cimport SIZE_t
+from ._utils cimport INT8_t
 from ._utils cimport INT32_t
 from ._utils cimport UINT32_t
 
@@ -29,10 +30,10 @@ Leaf node:
 """
 cdef struct Node:
 
-    # Mandatory node properties
+    # Mandatory node properties; the 4-byte fields are paired to avoid padding
     SIZE_t   n_samples                 # Number of samples in the node
     SIZE_t   n_pos_samples             # Number of pos. samples in the node
-    SIZE_t   depth                     # Depth of node
+    INT32_t  depth                     # Depth of node
     bint     is_left                   # Whether this node is a left child
     Node*    left                      # Left child node
     Node*    right                     # Right child node
@@ -90,6 +91,17 @@ cdef struct IntList:
     SIZE_t* arr
     SIZE_t  n
 
+"""
+Struct to hold a partition of samples waiting to be built into a subtree.
+"""
+cdef struct BuildRecord:
+    IntList* samples                   # Samples in this partition
+    SIZE_t   n_pos_samples             # Number of pos. samples in this partition
+    IntList* constant_features         # Array of constant feature indices
+    SIZE_t   depth                     # Depth of the node to build
+    bint     is_left                   # Whether the node is a left child
+    Node**   node_ptr                  # Where to store the built node
+
 cdef class _Tree:
     """
     The Tree object is a binary tree structure constructed by the
@@ -99,8 +111,16 @@ cdef class _Tree:
     # Inner structures
     cdef Node*   root                    # Root node
 
+    # Flattened node arrays used for prediction, NULL until built
+    cdef SIZE_t   n_flat_nodes           # Number of flattened nodes
+    cdef SIZE_t*  flat_features          # Feature index of each decision node
+    cdef DTYPE_t* flat_thresholds        # Threshold value of each decision node
+    cdef SIZE_t*  flat_children_left     # Left child position, UNDEF if leaf
+    cdef SIZE_t*  flat_children_right    # Right child position, UNDEF if leaf
+    cdef DTYPE_t* flat_values            # Value of each leaf node
+
     # Python API
-    cpdef np.ndarray predict(self, float[:, :] X)
+    cpdef np.ndarray predict(self, float[:, :] X, int n_threads)
     cpdef SIZE_t get_structure_memory(self)
     cpdef SIZE_t get_decision_stats_memory(self)
     cpdef SIZE_t get_leaf_stats_memory(self)
@@ -109,6 +129,16 @@ cdef class _Tree:
     cpdef SIZE_t get_greedy_node_count(self, SIZE_t topd)
 
     # C API
+    cdef int _update_flat(self) except -1
+    cdef void _clear_flat(self) nogil
+    cdef SIZE_t _flatten(self,
+                         Node*    node,
+                         SIZE_t*  n_nodes_ptr,
+                         SIZE_t*  features,
+                         DTYPE_t* thresholds,
+                         SIZE_t*  children_left,
+                         SIZE_t*  children_right,
+                         DTYPE_t* values) nogil
     cdef SIZE_t _get_structure_memory(self, Node* node) nogil
     cdef SIZE_t _get_decision_stats_memory(self, Node* node) nogil
     cdef SIZE_t _get_leaf_stats_memory(self, Node* node) nogil
@@ -118,7 +148,7 @@ cdef class _Tree:
 
 cdef class _TreeBuilder:
     """
-    The TreeBuilder recursively builds a Tree object from training samples,
+    The TreeBuilder builds a Tree object depth-first from training samples,
     using a Splitter object for splitting internal nodes and assigning values to leaves.
 
     This class controls the various stopping criteria and the node splitting
@@ -130,13 +160,14 @@ cdef class _TreeBuilder:
     cdef _Config      config               # Configuration object holding training parameters
 
     # Python API
-    cpdef void build(self, _Tree tree)
+    cpdef void build(self, _Tree tree) except *
 
     # C API
     cdef Node* _build(self,
                       DTYPE_t** X,
-                      INT32_t*  y,
+                      INT8_t*   y,
                       IntList*  samples,
+                      SIZE_t    n_pos_samples,
                       IntList*  constant_features,
                       SIZE_t    depth,
                       bint      is_left) nogil
@@ -148,6 +179,6 @@ cdef class _TreeBuilder:
     cdef Node* initialize_node(self,
                                SIZE_t   depth,
                                bint     is_left,
-                               INT32_t* y,
                                IntList* samples,
+                               SIZE_t   n_pos_samples,
                                IntList* constant_features) nogil
@@ -5,6 +5,7 @@
 Tree and tree builder objects.
 """
 cimport cython
+from cython.parallel cimport prange
 
 from cpython cimport Py_INCREF
 from cpython.ref cimport PyObject
@@ -43,14 +44,14 @@ cdef class _TreeBuilder:
         self.splitter = splitter
         self.config = config
 
-    cpdef void build(self, _Tree tree):
+    cpdef void build(self, _Tree tree) except *:
         """
         Build a decision tree from the training set (X, y).
         """
 
         # Data containers
         cdef DTYPE_t** X = NULL
-        cdef INT32_t*  y = NULL
+        cdef INT8_t*   y = NULL
         self.manager.get_data(&X, &y)
 
         # create list of sample indices
@@ -58,51 +59,90 @@ cdef class _TreeBuilder:
         for i in range(samples.n):
             samples.arr[i] = i
 
+        # count positive samples once, children inherit their counts from the split
+        cdef SIZE_t n_pos_samples = 0
+        for i in range(samples.n):
+            n_pos_samples += y[i]
+
         # initialize container for constant features
         cdef IntList* constant_features = create_intlist(self.manager.n_features, 0)
 
-        tree.root = self._build(X, y, samples, constant_features, 0, 0)
+        # build without the GIL so that trees of a forest can be built in parallel threads
+        cdef Node* root = NULL
+        with nogil:
+            root = self._build(X, y, samples, n_pos_samples, constant_features, 0, 0)
+
+        tree.root = root
+        tree._update_flat()
 
     cdef Node* _build(self,
                       DTYPE_t** X,
-                      INT32_t*  y,
+                      INT8_t*   y,
                       IntList*  samples,
+                      SIZE_t    n_pos_samples,
                       IntList*  constant_features,
                       SIZE_t    depth,
                       bint      is_left) nogil:
         """
-        Build a subtree given a partition of samples.
-        """
+        Build a subtree given a partition of samples and its no. pos. samples.
 
-        # create node
-        # printf('[B] initializing node\n')
-        cdef Node *node = self.initialize_node(depth, is_left, y, samples, constant_features)
-        # printf('[B] done initializing node\n')
+        Partitions waiting to be built are kept on an explicit stack; the
+        right child is pushed before the left so nodes are built in the
+        same (pre-)order as a recursive depth-first build.
+        """
+        cdef Node* root = NULL
+        cdef Node* node = NULL
 
         # data variables
         cdef SIZE_t n_total_features = self.manager.n_features
 
         # boolean variables
-        cdef bint is_bottom_leaf = (depth >= self.config.max_depth)
-        cdef bint is_middle_leaf = (samples.n < self.config.min_samples_split or
-                                    samples.n < 2 * self.config.min_samples_leaf or
-                                    node.n_pos_samples == 0 or
-                                    node.n_pos_samples == node.n_samples)
+        cdef bint is_bottom_leaf = False
+        cdef bint is_middle_leaf = False
 
         # result containers
         cdef SplitRecord split
         cdef SIZE_t      n_usable_thresholds = 0
 
-        # printf('\n[B] samples.n: %ld, depth: %ld, is_left: %d\n', samples.n, depth, is_left)
-
-        # leaf node
-        if is_bottom_leaf or is_middle_leaf:
-            # printf('[B] bottom / middle leaf\n')
-            self.set_leaf_node(node, samples)
-            # printf('[B] leaf.value: %.2f\n', node.value)
-
-        # leaf or decision node
-        else:
+        # stack of partitions left to build
+        cdef SIZE_t       stack_capacity = 64
+        cdef SIZE_t       stack_n = 0
+        cdef BuildRecord* stack = <BuildRecord *>malloc(stack_capacity * sizeof(BuildRecord))
+        cdef BuildRecord  record
+
+        record.samples = samples
+        record.n_pos_samples = n_pos_samples
+        record.constant_features = constant_features
+        record.depth = depth
+        record.is_left = is_left
+        record.node_ptr = &root
+        stack[stack_n] = record
+        stack_n += 1
+
+        while stack_n > 0:
+            stack_n -= 1
+            record = stack[stack_n]
+            samples = record.samples
+
+            # create node
+            node = self.initialize_node(record.depth, record.is_left, samples,
+                                        record.n_pos_samples, record.constant_features)
+            record.node_ptr[0] = node
+
+            is_bottom_leaf = (record.depth >= self.config.max_depth)
+            is_middle_leaf = (samples.n < self.config.min_samples_split or
+                              samples.n < 2 * self.config.min_samples_leaf or
+                              node.n_pos_samples == 0 or
+                              node.n_pos_samples == node.n_samples)
+
+            # printf('\n[B] samples.n: %ld, depth: %ld, is_left: %d\n', samples.n, record.depth, record.is_left)
+
+            # leaf node
+            if is_bottom_leaf or is_middle_leaf:
+                # printf('[B] bottom / middle leaf\n')
+                self.set_leaf_node(node, samples)
+                # printf('[B] leaf.value: %.2f\n', node.value)
+                continue
 
             # select a threshold to to split the samples
             # printf('[B] select threshold\n')
@@ -115,22 +155,41 @@ cdef class _TreeBuilder:
                 dealloc(node)  # free allocated memory
                 self.set_leaf_node(node, samples)
                 # printf('[B] leaf.value: %.2f\n', node.value)
+                continue
 
             # decision node
-            else:
-                # printf('[B] split samples\n')
-                split_samples(node, X, y, samples, &split, 1)
-                # printf('[B] depth: %ld, chosen_feature.index: %ld, chosen_threshold.value: %.2f\n',
-                #       node.depth, node.chosen_feature.index, node.chosen_threshold.value)
-
-                # printf('[B] split.left_samples.n: %ld, split.right_samples.n: %ld\n',
-                #        split.left_samples.n, split.right_samples.n)
-
-                # traverse to left and right branches
-                node.left = self._build(X, y, split.left_samples, split.left_constant_features, depth + 1, 1)
-                node.right = self._build(X, y, split.right_samples, split.right_constant_features, depth + 1, 0)
-
-        return node
+            # printf('[B] split samples\n')
+            split_samples(node, X, y, samples, &split, 1)
+            # printf('[B] depth: %ld, chosen_feature.index: %ld, chosen_threshold.value: %.2f\n',
+            #       node.depth, node.chosen_feature.index, node.chosen_threshold.value)
+
+            # make room for both children
+            if stack_n + 2 > stack_capacity:
+                stack_capacity *= 2
+                stack = <BuildRecord *>realloc(stack, stack_capacity * sizeof(BuildRecord))
+
+            # push right branch
+            record.samples = split.right_samples
+            record.n_pos_samples = split.n_right_pos_samples
+            record.constant_features = split.right_constant_features
+            record.depth = node.depth + 1
+            record.is_left = 0
+            record.node_ptr = &node.right
+            stack[stack_n] = record
+            stack_n += 1
+
+            # push left branch, built next
+            record.samples = split.left_samples
+            record.n_pos_samples = split.n_left_pos_samples
+            record.constant_features = split.left_constant_features
+            record.is_left = 1
+            record.node_ptr = &node.left
+            stack[stack_n] = record
+            stack_n += 1
+
+        free(stack)
+
+        return root
 
     cdef void set_leaf_node(self,
                             Node*    node,
@@ -165,22 +224,13 @@ cdef class _TreeBuilder:
     cdef Node* initialize_node(self,
                                SIZE_t   depth,
                                bint     is_left,
-                               INT32_t* y,
                                IntList* samples,
+                               SIZE_t   n_pos_samples,
                                IntList* constant_features) nogil:
         """
         Create and initialize a new node.
         """
 
-        # compute number of positive samples
-        cdef SIZE_t n_pos_samples = 0
-        # printf('[B - IN] computing n_pos_samples\n')
-        # printf('[B - IN] samples.n: %lu\n', samples.n)
-        for i in range(samples.n):
-            n_pos_samples += y[samples.arr[i]]
-
-        # printf('[B - IN] n_pos_samples: %lu\n', n_pos_samples)
-
         # create node
         cdef Node *node = <Node *>malloc(sizeof(Node))
 
@@ -220,6 +270,12 @@ cdef class _Tree:
         Constructor.
         """
         self.root = NULL
+        self.n_flat_nodes = 0
+        self.flat_features = NULL
+        self.flat_thresholds = NULL
+        self.flat_children_left = NULL
+        self.flat_children_right = NULL
+        self.flat_values = NULL
 
     def __dealloc__(self):
         """
@@ -230,31 +286,47 @@ cdef class _Tree:
             dealloc(self.root)
             free(self.root)
 
-    cpdef np.ndarray predict(self, float[:,:] X):
+        self._clear_flat()
+
+    cpdef np.ndarray predict(self, float[:,:] X, int n_threads):
         """
         Predict probability of positive label for X.
+
+        The tree is flattened into node arrays whenever it is built or
+        updated, so each prediction is a read-only walk over contiguous
+        memory; samples are routed in parallel using `n_threads`.
         """
 
         # In / out
         cdef SIZE_t n_samples = X.shape[0]
         cdef np.ndarray[float] out = np.zeros((n_samples,), dtype=np.float32)
 
+        # Flattened tree
+        if self.flat_values == NULL:
+            raise ValueError('tree has not been built!')
+
+        cdef SIZE_t*  features = self.flat_features
+        cdef DTYPE_t* thresholds = self.flat_thresholds
+        cdef SIZE_t*  children_left = self.flat_children_left
+        cdef SIZE_t*  children_right = self.flat_children_right
+        cdef DTYPE_t* values = self.flat_values
+
         # Incrementers
         cdef SIZE_t i = 0
-        cdef Node* node
+        cdef SIZE_t j = 0
 
         with nogil:
 
-            for i in range(n_samples):
-                node = self.root
+            for i in prange(n_samples, schedule='static', num_threads=n_threads):
+                j = 0
 
-                while not node.is_leaf:
-                    if X[i, node.chosen_feature.index] <= node.chosen_threshold.value:
-                        node = node.left
+                while children_left[j] != UNDEF:
+                    if X[i, features[j]] <= thresholds[j]:
+                        j = children_left[j]
                     else:
-                        node = node.right
+                        j = children_right[j]
 
-                out[i] = node.value
+                out[i] = values[j]
 
         return out
 
@@ -398,6 +470,94 @@ cdef class _Tree:
 
         return result + self._get_leaf_stats_memory(node.left) + self._get_leaf_stats_memory(node.right)
 
+    cdef int _update_flat(self) except -1:
+        """
+        Flatten the current tree into the node arrays used for prediction.
+
+        The arrays are filled in local buffers and only replace the
+        previous ones once complete, so `predict` never sees a partial tree.
+        """
+        cdef SIZE_t   n_nodes = self._get_node_count(self.root)
+        cdef SIZE_t*  features = <SIZE_t *>malloc(n_nodes * sizeof(SIZE_t))
+        cdef DTYPE_t* thresholds = <DTYPE_t *>malloc(n_nodes * sizeof(DTYPE_t))
+        cdef SIZE_t*  children_left = <SIZE_t *>malloc(n_nodes * sizeof(SIZE_t))
+        cdef SIZE_t*  children_right = <SIZE_t *>malloc(n_nodes * sizeof(SIZE_t))
+        cdef DTYPE_t* values = <DTYPE_t *>malloc(n_nodes * sizeof(DTYPE_t))
+
+        if (features == NULL or thresholds == NULL or children_left == NULL or
+                children_right == NULL or values == NULL):
+            free(features)
+            free(thresholds)
+            free(children_left)
+            free(children_right)
+            free(values)
+            raise MemoryError()
+
+        n_nodes = 0
+        with nogil:
+            self._flatten(self.root, &n_nodes, features, thresholds,
+                          children_left, children_right, values)
+
+        # publish the complete arrays while holding the GIL
+        self._clear_flat()
+        self.n_flat_nodes = n_nodes
+        self.flat_features = features
+        self.flat_thresholds = thresholds
+        self.flat_children_left = children_left
+        self.flat_children_right = children_right
+        self.flat_values = values
+
+        return 0
+
+    cdef void _clear_flat(self) nogil:
+        """
+        Free the flattened node arrays, e.g. after the tree has changed.
+        """
+        free(self.flat_features)
+        free(self.flat_thresholds)
+        free(self.flat_children_left)
+        free(self.flat_children_right)
+        free(self.flat_values)
+
+        self.n_flat_nodes = 0
+        self.flat_features = NULL
+        self.flat_thresholds = NULL
+        self.flat_children_left = NULL
+        self.flat_children_right = NULL
+        self.flat_values = NULL
+
+    cdef SIZE_t _flatten(self,
+                         Node*    node,
+                         SIZE_t*  n_nodes_ptr,
+                         SIZE_t*  features,
+                         DTYPE_t* thresholds,
+                         SIZE_t*  children_left,
+                         SIZE_t*  children_right,
+                         DTYPE_t* values) nogil:
+        """
+        Write the subtree into the node arrays in depth-first order,
+        and return the position of this node. Leaves have no children (UNDEF).
+        """
+        cdef SIZE_t node_id = n_nodes_ptr[0]
+        n_nodes_ptr[0] += 1
+
+        # leaf node
+        if node.is_leaf:
+            children_left[node_id] = UNDEF
+            children_right[node_id] = UNDEF
+            values[node_id] = node.value
+
+        # decision node
+        else:
+            features[node_id] = node.chosen_feature.index
+            thresholds[node_id] = node.chosen_threshold.value
+            children_left[node_id] = self._flatten(node.left, n_nodes_ptr, features, thresholds,
+                                                   children_left, children_right, values)
+            children_right[node_id] = self._flatten(node.right, n_nodes_ptr, features, thresholds,
+                                                    children_left, children_right, values)
+
+        return node_id
+
     cdef SIZE_t _get_node_count(self, Node* node) nogil:
         """
         Count total no. of nodes in the tree.
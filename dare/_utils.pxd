@@ -1,8 +1,11 @@
 import numpy as np
 cimport numpy as np
 
+from libc.math cimport log2
+
 ctypedef np.npy_float32 DTYPE_t          # Type of X
 ctypedef np.npy_intp    SIZE_t           # Type for indices and counters
+ctypedef np.npy_int8    INT8_t           # Signed 8 bit integer, type of y
 ctypedef np.npy_int32   INT32_t          # Signed 32 bit integer
 ctypedef np.npy_uint32  UINT32_t         # Unsigned 32 bit integer
 
@@ -29,25 +32,105 @@ cdef double rand_uniform(double    low,
                          double    high,
                          UINT32_t* random_state) nogil
 
-# split score methods
-cdef DTYPE_t compute_split_score(bint    use_gini,
-                                 DTYPE_t count,
+# split score methods, defined here so they are inlined into the split search loops
+cdef inline DTYPE_t compute_gini(DTYPE_t count,
                                  DTYPE_t left_count,
                                  DTYPE_t right_count,
                                  SIZE_t  left_pos_count,
-                                 SIZE_t  right_pos_count) nogil
+                                 SIZE_t  right_pos_count) nogil:
+    """
+    Compute the Gini index given this attribute.
+    """
+    cdef DTYPE_t weight
+    cdef DTYPE_t pos_prob
+    cdef DTYPE_t neg_prob
+
+    cdef DTYPE_t index
+    cdef DTYPE_t left_weighted_index = 0
+    cdef DTYPE_t right_weighted_index = 0
+
+    if left_count > 0:
+        weight = left_count / count
+        pos_prob = left_pos_count / left_count
+        neg_prob = 1 - pos_prob
+        index = 1 - (pos_prob * pos_prob) - (neg_prob * neg_prob)
+        left_weighted_index = weight * index
+
+    if right_count > 0:
+        weight = right_count / count
+        pos_prob = right_pos_count / right_count
+        neg_prob = 1 - pos_prob
+        index = 1 - (pos_prob * pos_prob) - (neg_prob * neg_prob)
+        right_weighted_index = weight * index
+
+    return left_weighted_index + right_weighted_index
+
+
+cdef inline DTYPE_t compute_entropy(DTYPE_t count,
+                                    DTYPE_t left_count,
+                                    DTYPE_t right_count,
+                                    SIZE_t  left_pos_count,
+                                    SIZE_t  right_pos_count) nogil:
+    """
+    Compute the mutual information given this attribute.
+    """
+    cdef DTYPE_t weight
+    cdef DTYPE_t pos_prob
+    cdef DTYPE_t neg_prob
+
+    cdef DTYPE_t entropy
+    cdef DTYPE_t left_weighted_entropy = 0
+    cdef DTYPE_t right_weighted_entropy = 0
+
+    if left_count > 0:
+        weight = left_count / count
+        pos_prob = left_pos_count / left_count
+        neg_prob = 1 - pos_prob
+
+        entropy = 0
+        if pos_prob > 0:
+            entropy -= pos_prob * log2(pos_prob)
+        if neg_prob > 0:
+            entropy -= neg_prob * log2(neg_prob)
+
+        left_weighted_entropy = weight * entropy
+
+    if right_count > 0:
+        weight = right_count / count
+        pos_prob = right_pos_count / right_count
+        neg_prob = 1 - pos_prob
+
+        entropy = 0
+        if pos_prob > 0:
+            entropy -= pos_prob * log2(pos_prob)
+        if neg_prob > 0:
+            entropy -= neg_prob * log2(neg_prob)
+
+        right_weighted_entropy = weight * entropy
+
+    return left_weighted_entropy + right_weighted_entropy
+
+
+cdef inline DTYPE_t compute_split_score(bint    use_gini,
+                                        DTYPE_t count,
+                                        DTYPE_t left_count,
+                                        DTYPE_t right_count,
+                                        SIZE_t  left_pos_count,
+                                        SIZE_t  right_pos_count) nogil:
+    """
+    Computes either the Gini index or entropy given this attribute.
+    """
+    cdef DTYPE_t result
+
+    if use_gini:
+        result = compute_gini(count, left_count, right_count,
+                              left_pos_count, right_pos_count)
 
-cdef DTYPE_t compute_gini(DTYPE_t count,
-                          DTYPE_t left_count,
-                          DTYPE_t right_count,
-                          SIZE_t  left_pos_count,
-                          SIZE_t  right_pos_count) nogil
+    else:
+        result = compute_entropy(count, left_count, right_count,
+                                 left_pos_count, right_pos_count)
 
-cdef DTYPE_t compute_entropy(DTYPE_t count,
-                             DTYPE_t left_count,
-                             DTYPE_t right_count,
-                             SIZE_t  left_pos_count,
-                             SIZE_t  right_pos_count) nogil
+    return result
 
 # Feature / threshold methodss
 cdef Feature* create_feature(SIZE_t feature_index) nogil
@@ -81,7 +164,7 @@ cdef SIZE_t* copy_indices(SIZE_t* arr,
 # node methods
 cdef void split_samples(Node*        node,
                         DTYPE_t**    X,
-                        INT32_t*     y,
+                        INT8_t*      y,
                         IntList*     samples,
                         SplitRecord* split,
                         bint         copy_constant_features) nogil
@@ -11,6 +11,7 @@ from libc.stdlib cimport rand
 from libc.stdlib cimport srand
 from libc.stdlib cimport RAND_MAX
 from libc.stdio cimport printf
+from libc.string cimport memcpy
 from libc.math cimport exp
 from libc.math cimport log
 from libc.math cimport log2
@@ -73,108 +74,6 @@ cdef inline double rand_uniform(double low, double high,
     return ((high - low) * <double> our_rand_r(random_state) /
             <double> RAND_R_MAX) + low
 
-# SCORING METHODS
-
-cdef DTYPE_t compute_split_score(bint    use_gini,
-                                 DTYPE_t count,
-                                 DTYPE_t left_count,
-                                 DTYPE_t right_count,
-                                 SIZE_t  left_pos_count,
-                                 SIZE_t  right_pos_count) nogil:
-    """
-    Computes either the Gini index or entropy given this attribute.
-    """
-    cdef DTYPE_t result
-
-    if use_gini:
-        result = compute_gini(count, left_count, right_count,
-                              left_pos_count, right_pos_count)
-
-    else:
-        result = compute_entropy(count, left_count, right_count,
-                                 left_pos_count, right_pos_count)
-
-    return result
-
-
-cdef DTYPE_t compute_gini(DTYPE_t count,
-                          DTYPE_t left_count,
-                          DTYPE_t right_count,
-                          SIZE_t  left_pos_count,
-                          SIZE_t  right_pos_count) nogil:
-    """
-    Compute the Gini index given this attribute.
-    """
-    cdef DTYPE_t weight
-    cdef DTYPE_t pos_prob
-    cdef DTYPE_t neg_prob
-
-    cdef DTYPE_t index
-    cdef DTYPE_t left_weighted_index = 0
-    cdef DTYPE_t right_weighted_index = 0
-
-    if left_count > 0:
-        weight = left_count / count
-        pos_prob = left_pos_count / left_count
-        neg_prob = 1 - pos_prob
-        index = 1 - (pos_prob * pos_prob) - (neg_prob * neg_prob)
-        left_weighted_index = weight * index
-
-    if right_count > 0:
-        weight = right_count / count
-        pos_prob = right_pos_count / right_count
-        neg_prob = 1 - pos_prob
-        index = 1 - (pos_prob * pos_prob) - (neg_prob * neg_prob)
-        right_weighted_index = weight * index
-
-    return left_weighted_index + right_weighted_index
-
-
-cdef DTYPE_t compute_entropy(DTYPE_t count,
-                             DTYPE_t left_count,
-                             DTYPE_t right_count,
-                             SIZE_t  left_pos_count,
-                             SIZE_t  right_pos_count) nogil:
-    """
-    Compute the mutual information given this attribute.
-    """
-    cdef DTYPE_t weight
-    cdef DTYPE_t pos_prob
-    cdef DTYPE_t neg_prob
-
-    cdef DTYPE_t entropy
-    cdef DTYPE_t left_weighted_entropy = 0
-    cdef DTYPE_t right_weighted_entropy = 0
-
-    if left_count > 0:
-        weight = left_count / count
-        pos_prob = left_pos_count / left_count
-        neg_prob = 1 - pos_prob
-
-        entropy = 0
-        if pos_prob > 0:
-            entropy -= pos_prob * log2(pos_prob)
-        if neg_prob > 0:
-            entropy -= neg_prob * log2(neg_prob)
-
-        left_weighted_entropy = weight * entropy
-
-    if right_count > 0:
-        weight = right_count / count
-        pos_prob = right_pos_count / right_count
-        neg_prob = 1 - pos_prob
-
-        entropy = 0
-        if pos_prob > 0:
-            entropy -= pos_prob * log2(pos_prob)
-        if neg_prob > 0:
-            entropy -= neg_prob * log2(neg_prob)
-
-        right_weighted_entropy = weight * entropy
-
-    return left_weighted_entropy + right_weighted_entropy
-
-
 # FEATURE / THRESHOLD METHODS
 
 
@@ -246,17 +145,7 @@ cdef Threshold* copy_threshold(Threshold* threshold) nogil:
     Copies the contents of a threshold to a new threshold.
     """
     cdef Threshold* new_threshold = <Threshold *>malloc(sizeof(Threshold))
-    new_threshold.v1 = threshold.v1
-    new_threshold.v2 = threshold.v2
-    new_threshold.value = threshold.value
-    new_threshold.n_v1_samples = threshold.n_v1_samples
-    new_threshold.n_v1_pos_samples = threshold.n_v1_pos_samples
-    new_threshold.n_v2_samples = threshold.n_v2_samples
-    new_threshold.n_v2_pos_samples = threshold.n_v2_pos_samples
-    new_threshold.n_left_samples = threshold.n_left_samples
-    new_threshold.n_left_pos_samples = threshold.n_left_pos_samples
-    new_threshold.n_right_samples = threshold.n_right_samples
-    new_threshold.n_right_pos_samples = threshold.n_right_pos_samples
+    memcpy(new_threshold, threshold, sizeof(Threshold))
     return new_threshold
 
 
@@ -332,8 +221,7 @@ cdef IntList* copy_intlist(IntList* obj, SIZE_t n_elem) nogil:
     cdef IntList* new_obj = create_intlist(n_elem, 0)
 
     # copy array values
-    for i in range(obj.n):
-        new_obj.arr[i] = obj.arr[i]
+    memcpy(new_obj.arr, obj.arr, obj.n * sizeof(SIZE_t))
 
     # set n
     new_obj.n = obj.n
@@ -371,9 +259,7 @@ cdef INT32_t* copy_int_array(INT32_t* arr, SIZE_t n_elem) nogil:
     Copies a C int array into a new C int array.
     """
     cdef INT32_t* new_arr = <INT32_t *>malloc(n_elem * sizeof(INT32_t))
-
-    for i in range(n_elem):
-        new_arr[i] = arr[i]
+    memcpy(new_arr, arr, n_elem * sizeof(INT32_t))
 
     return new_arr
 
@@ -383,9 +269,7 @@ cdef SIZE_t* copy_indices(SIZE_t* arr, SIZE_t n_elem) nogil:
     Copies a C int array into a new C int array.
     """
     cdef SIZE_t* new_arr = <SIZE_t *>malloc(n_elem * sizeof(SIZE_t))
-
-    for i in range(n_elem):
-        new_arr[i] = arr[i]
+    memcpy(new_arr, arr, n_elem * sizeof(SIZE_t))
 
     return new_arr
 
@@ -395,7 +279,7 @@ cdef SIZE_t* copy_indices(SIZE_t* arr, SIZE_t n_elem) nogil:
 
 cdef void split_samples(Node*        node,
                         DTYPE_t**    X,
-                        INT32_t*     y,
+                        INT8_t*      y,
                         IntList*     samples,
                         SplitRecord* split,
                         bint         copy_constant_features) nogil:
@@ -408,6 +292,8 @@ cdef void split_samples(Node*        node,
     # split samples based on the chosen feature / threshold
     split.left_samples = create_intlist(samples.n, 0)
     split.right_samples = create_intlist(samples.n, 0)
+    split.n_left_pos_samples = 0
+    split.n_right_pos_samples = 0
 
     # printf('[U - SS] node.chosen_feature.index: %ld, node.chosen_threshold.value: %.5f\n',
     #        node.chosen_feature.index, node.chosen_threshold.value)
@@ -421,14 +307,16 @@ cdef void split_samples(Node*        node,
         #        i, node.chosen_feature.index, X[samples.arr[i]][node.chosen_feature.index], node.chosen_threshold.value)
 
         # add sample to the left branch
-        if X[samples.arr[i]][node.chosen_feature.index] <= node.chosen_threshold.value:
+        if X[node.chosen_feature.index][samples.arr[i]] <= node.chosen_threshold.value:
             split.left_samples.arr[split.left_samples.n] = samples.arr[i]
             split.left_samples.n += 1
+            split.n_left_pos_samples += y[samples.arr[i]]
 
         # add sample to the right branch
         else:
             split.right_samples.arr[split.right_samples.n] = samples.arr[i]
             split.right_samples.n += 1
+            split.n_right_pos_samples += y[samples.arr[i]]
 
     # printf('[U - SS] split.left_samples.n: %ld, split.right_samples.n: %ld\n',
     #        split.left_samples.n, split.right_samples.n)
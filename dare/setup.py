@@ -1,4 +1,5 @@
 import os
+import sys
 
 import numpy
 from numpy.distutils.misc_util import Configuration
@@ -13,6 +14,17 @@ def configuration(parent_package='', top_path=None):
     if os.name == 'posix':
         libraries.append('m')
 
+    # parallel prediction, falls back to a serial loop without OpenMP;
+    # Apple clang has no built-in OpenMP support, so macOS builds are serial
+    openmp_args = []
+    if sys.platform.startswith('linux'):
+        openmp_args.append('-fopenmp')
+    elif sys.platform == 'win32':
+        openmp_args.append('/openmp')
+    else:
+        print('warning: OpenMP is not enabled on {}, prediction will be serial'.format(sys.platform),
+              file=sys.stderr)
+
     config.add_extension("_config",
                          sources=["_config.pyx"],
                          include_dirs=[numpy.get_include()],
@@ -27,7 +39,8 @@ def configuration(parent_package='', top_path=None):
                          sources=["_tree.pyx"],
                          include_dirs=[numpy.get_include()],
                          libraries=libraries,
-                         extra_compile_args=["-O3"])
+                         extra_compile_args=["-O3"] + openmp_args,
+                         extra_link_args=openmp_args)
     config.add_extension("_splitter",
                          sources=["_splitter.pyx"],
                          include_dirs=[numpy.get_include()],
@@ -246,7 +246,7 @@ def experiment(args, logger, out_dir):
     results['acc_clean'] = acc_clean
     results['auc_clean'] = auc_clean
     results['ap_clean'] = ap_clean
-    np.save(os.path.join(out_dir, 'results.npy'), results)
+    exp_util.save_results(results, os.path.join(out_dir, 'results.json'))
 
     logger.info('time: {:3f}s'.format(time.time() - start))
 
@@ -264,7 +264,8 @@ def main(args):
     os.makedirs(out_dir, exist_ok=True)
 
     # skip experiment if results already exist
-    if args.append_results and os.path.exists(os.path.join(out_dir, 'results.npy')):
+    if args.append_results and (os.path.exists(os.path.join(out_dir, 'results.json')) or
+                                os.path.exists(os.path.join(out_dir, 'results.npy'))):
         return
 
     # create logger
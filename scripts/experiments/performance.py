@@ -5,21 +5,16 @@ import os
 import sys
 import time
 import argparse
+import logging
 import resource
 from datetime import datetime
 
 import numpy as np
-import pandas as pd
-from sklearn.model_selection import GridSearchCV
-from sklearn.model_selection import StratifiedShuffleSplit
-from sklearn.model_selection import StratifiedKFold
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.ensemble import ExtraTreesClassifier
+from joblib import parallel_backend
 
 here = os.path.abspath(os.path.dirname(__file__))
 sys.path.insert(0, here + '/../../')
 sys.path.insert(0, here + '/../')
-import dare
 from utility import data_util
 from utility import exp_util
 from utility import print_util
@@ -31,6 +26,7 @@ def _get_model(args):
     """
 
     if args.model in ['dare']:
+        import dare
         model = dare.Forest(criterion=args.criterion,
                             max_depth=args.max_depth,
                             n_estimators=args.n_estimators,
@@ -38,29 +34,37 @@ def _get_model(args):
                             topd=args.topd,
                             k=args.k,
                             verbose=args.verbose,
-                            random_state=args.rs)
+                            random_state=args.rs,
+                            n_jobs=args.n_jobs)
 
     elif args.model == 'extra_trees':
+        from sklearn.ensemble import ExtraTreesClassifier
         model = ExtraTreesClassifier(n_estimators=args.n_estimators,
                                      max_depth=args.max_depth,
                                      max_features=args.max_features,
                                      criterion=args.criterion,
-                                     random_state=args.rs)
+                                     random_state=args.rs,
+                                     n_jobs=args.n_jobs)
 
     elif args.model == 'extra_trees_k1':
+        from sklearn.ensemble import ExtraTreesClassifier
         model = ExtraTreesClassifier(n_estimators=args.n_estimators,
                                      max_depth=args.max_depth,
                                      max_features=1,
                                      criterion=args.criterion,
-                                     random_state=args.rs)
+                                     random_state=args.rs,
+                                     n_jobs=args.n_jobs)
 
     elif args.model == 'sklearn':
+        from sklearn.ensemble import RandomForestClassifier
         model = RandomForestClassifier(n_estimators=args.n_estimators,
                                        max_depth=args.max_depth,
                                        max_features=args.max_features,
                                        criterion=args.criterion,
                                        random_state=args.rs,
-                                       bootstrap=args.bootstrap)
+                                       n_jobs=args.n_jobs,
+                                       bootstrap=args.bootstrap,
+                                       max_samples=args.max_samples)
     else:
         raise ValueError('model {} unknown!'.format(args.model))
 
@@ -73,6 +77,7 @@ def _get_model_dict(args, params):
     """
 
     if args.model == 'dare':
+        import dare
         model = dare.Forest(criterion=args.criterion,
                             max_depth=params['max_depth'],
                             n_estimators=params['n_estimators'],
@@ -80,57 +85,100 @@ def _get_model_dict(args, params):
                             topd=args.topd,
                             k=params['k'],
                             verbose=args.verbose,
-                            random_state=args.rs)
+                            random_state=args.rs,
+                            n_jobs=args.n_jobs)
 
     elif args.model == 'extra_trees':
+        from sklearn.ensemble import ExtraTreesClassifier
         model = ExtraTreesClassifier(n_estimators=params['n_estimators'],
                                      max_depth=params['max_depth'],
                                      max_features=args.max_features,
                                      criterion=args.criterion,
-                                     random_state=args.rs)
+                                     random_state=args.rs,
+                                     n_jobs=args.n_jobs)
 
     elif args.model == 'extra_trees_k1':
+        from sklearn.ensemble import ExtraTreesClassifier
         model = ExtraTreesClassifier(n_estimators=params['n_estimators'],
                                      max_depth=params['max_depth'],
                                      max_features=1,
                                      criterion=args.criterion,
-                                     random_state=args.rs)
+                                     random_state=args.rs,
+                                     n_jobs=args.n_jobs)
 
     elif args.model == 'sklearn':
+        from sklearn.ensemble import RandomForestClassifier
         model = RandomForestClassifier(n_estimators=params['n_estimators'],
                                        max_depth=params['max_depth'],
                                        max_features=args.max_features,
                                        criterion=args.criterion,
                                        random_state=args.rs,
-                                       bootstrap=args.bootstrap)
+                                       n_jobs=args.n_jobs,
+                                       bootstrap=args.bootstrap,
+                                       max_samples=args.max_samples)
     else:
         raise ValueError('model {} unknown!'.format(args.model))
 
     return model
 
 
+def _get_min_resources(y, param_grid, n_splits, factor=3, min_minority=5):
+    """
+    Returns the no. samples for the first round of successive halving: the
+    'exhaust' schedule ending on all samples, raised so that each (unstratified)
+    test fold is expected to hold at least `min_minority` minority-class samples.
+    """
+    n_samples = len(y)
+    n_candidates = int(np.prod([len(values) for values in param_grid.values()]))
+
+    # no. rounds needed to narrow the candidates down to one
+    n_iterations = 1
+    while factor ** n_iterations <= n_candidates:
+        n_iterations += 1
+
+    exhaust = n_samples // factor ** (n_iterations - 1)
+    minority_frac = np.unique(y, return_counts=True)[1].min() / n_samples
+    floor = int(np.ceil(min_minority * n_splits / minority_frac))
+
+    return min(max(exhaust, floor), n_samples)
+
+
 def _get_best_params(gs, param_grid, keys, logger, tol=1e-3):
     """
-    Chooses the set of hyperparameters whose `mean_fit_score` is within
-    `tol` of the best `mean_fit_score` and has the lowest `mean_fit_time`.
+    Chooses the set of hyperparameters from the last halving iteration, i.e.
+    fit on the most tuning samples, whose `mean_fit_score` is within `tol` of the
+    best `mean_fit_score` and has the lowest `mean_fit_time`.
     """
+    import pandas as pd
+
     pd.set_option('display.max_columns', 100)
     pd.set_option('display.max_rows', 100)
 
-    cols = ['mean_fit_time', 'mean_test_score', 'rank_test_score']
+    cols = ['iter', 'n_resources', 'mean_fit_time', 'mean_test_score', 'rank_test_score']
     cols += ['param_{}'.format(param) for param in keys]
 
-    df = pd.DataFrame(gs.cv_results_)
-    logger.info('gridsearch results:')
-    logger.info(df[cols].sort_values('rank_test_score'))
+    cv_results = gs.cv_results_
+    if logger.isEnabledFor(logging.INFO):
+        df = pd.DataFrame({col: cv_results[col] for col in cols})
+        logger.info('gridsearch results:')
+        logger.info(df.sort_values('rank_test_score'))
 
     # filter the parameters with the highest performances
-    logger.info('tolerance: {}'.format(args.tol))
-    df = df[df['mean_test_score'].max() - df['mean_test_score'] <= tol]
+    logger.info('tolerance: {}'.format(tol))
+    mean_test_score = np.asarray(cv_results['mean_test_score'])
+    mean_fit_time = np.asarray(cv_results['mean_fit_time'])
+    last_iter = np.asarray(cv_results['iter']) == gs.n_iterations_ - 1
+
+    # failed fits and single-class folds score NaN, skip them
+    if np.all(np.isnan(mean_test_score[last_iter])):
+        raise ValueError('all candidates in the last halving iteration scored NaN!')
 
-    best_df = df.sort_values('mean_fit_time').reset_index().loc[0]
-    best_ndx = best_df['index']
-    best_params = best_df['params']
+    best_score = np.nanmax(mean_test_score[last_iter])
+    mask = last_iter & (best_score - mean_test_score <= tol)
+
+    # fastest candidate among those within tolerance
+    best_ndx = np.argmin(np.where(mask, mean_fit_time, np.inf))
+    best_params = cv_results['params'][best_ndx]
     logger.info('best_index: {}, best_params: {}'.format(best_ndx, best_params))
 
     return best_params
@@ -143,6 +191,12 @@ def performance(args, out_dir, logger):
     # obtain data
     X_train, X_test, y_train, y_test = data_util.get_data(args.dataset, data_dir=args.data_dir)
 
+    # convert once up front so tuning and training fits do not each copy the data
+    X_train = np.ascontiguousarray(X_train, dtype=np.float32)
+    X_test = np.ascontiguousarray(X_test, dtype=np.float32)
+    y_train = np.ascontiguousarray(y_train, dtype=np.int32)
+    y_test = np.ascontiguousarray(y_test, dtype=np.int32)
+
     # dataset statistics
     logger.info('train instances: {:,}'.format(X_train.shape[0]))
     logger.info('test instances: {:,}'.format(X_test.shape[0]))
@@ -153,10 +207,12 @@ def performance(args, out_dir, logger):
     if not args.no_tune:
 
         if args.tune_frac < 1.0:
+            from sklearn.model_selection import StratifiedShuffleSplit
+
             sss = StratifiedShuffleSplit(n_splits=1, test_size=2,
                                          train_size=args.tune_frac,
                                          random_state=args.rs)
-            tune_indices, _ = list(sss.split(X_train, y_train))[0]
+            tune_indices, _ = next(sss.split(X_train, y_train))
             X_train_sub, y_train_sub = X_train[tune_indices], y_train[tune_indices]
             logger.info('tune instances: {:,}'.format(X_train_sub.shape[0]))
 
@@ -187,13 +243,34 @@ def performance(args, out_dir, logger):
 
     # tune hyperparameters
     if not args.no_tune:
+        from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+        from sklearn.model_selection import HalvingGridSearchCV
+        from sklearn.model_selection import StratifiedKFold
+
         logger.info('param_grid: {}'.format(param_grid))
 
-        # cross-validation
+        # cross-validation, folds are generated once and shared by all candidates
         skf = StratifiedKFold(n_splits=args.cv, shuffle=True, random_state=args.rs)
-        gs = GridSearchCV(model, param_grid, scoring=args.scoring,
-                          cv=skf, verbose=args.verbose, refit=False)
-        gs = gs.fit(X_train_sub, y_train_sub)
+        cv_splits = list(skf.split(X_train_sub, y_train_sub))
+
+        # candidates already run in parallel, so each one is fit single-threaded
+        model.set_params(n_jobs=1)
+
+        # smallest round is still large enough for every fold to contain both classes
+        min_resources = _get_min_resources(y_train_sub, param_grid, args.cv, factor=3)
+        logger.info('halving min_resources: {:,}'.format(min_resources))
+
+        # candidates are fit in parallel, keeping the best 1/3 with 3x more samples each round,
+        # failed fits score NaN and are skipped when choosing the best candidate
+        gs = HalvingGridSearchCV(model, param_grid, resource='n_samples',
+                                 min_resources=min_resources, factor=3,
+                                 random_state=args.rs, scoring=args.scoring, cv=cv_splits,
+                                 error_score=np.nan, verbose=args.verbose, refit=False,
+                                 n_jobs=args.n_jobs)
+
+        # one worker pool for the whole search, one BLAS thread per worker
+        with parallel_backend('loky', n_jobs=args.n_jobs, inner_max_num_threads=1):
+            gs = gs.fit(X_train_sub, y_train_sub)
 
         best_params = _get_best_params(gs, param_grid, keys, logger, args.tol)
         model = _get_model_dict(args, best_params)
@@ -221,13 +298,14 @@ def performance(args, out_dir, logger):
     result = model.get_params()
     result['model'] = args.model
     result['bootstrap'] = args.bootstrap
+    result['max_samples'] = args.max_samples
     result['auc'] = auc
     result['acc'] = acc
     result['ap'] = ap
     result['train_time'] = train_time
     result['tune_train_time'] = tune_time + train_time
     result['max_rss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
-    np.save(os.path.join(out_dir, 'results.npy'), result)
+    exp_util.save_results(result, os.path.join(out_dir, 'results.json'))
 
     logger.info('total time: {:.3f}s'.format(time.time() - begin))
     logger.info('max_rss: {:,}'.format(result['max_rss']))
@@ -251,6 +329,9 @@ def main(args):
         if args.bootstrap:
             out_dir = os.path.join(out_dir, 'bootstrap')
 
+            if args.max_samples is not None:
+                out_dir = os.path.join(out_dir, 'max_samples_{}'.format(args.max_samples))
+
     elif args.model == 'dare':
         assert args.topd == 0
         out_dir = os.path.join(out_dir, args.model)
@@ -295,6 +376,8 @@ if __name__ == '__main__':
     parser.add_argument('--topd', type=int, default=0, help='0 for exact, 1000 for random.')
     parser.add_argument('--k', type=int, default=25, help='no. of candidate thresholds to sample.')
     parser.add_argument('--bootstrap', action='store_true', default=False, help='use bootstrapping with sklearn.')
+    parser.add_argument('--max_samples', type=float, default=None,
+                        help='fraction of samples per bootstrap in (0, 1], requires --bootstrap.')
 
     # tuning settings
     parser.add_argument('--no_tune', action='store_true', default=False, help='do not tune.')
@@ -302,6 +385,7 @@ if __name__ == '__main__':
     parser.add_argument('--cv', type=int, default=5, help='number of cross-validation folds for tuning.')
     parser.add_argument('--scoring', type=str, default='roc_auc', help='metric for tuning.')
     parser.add_argument('--tol', type=float, default=1e-3, help='allowable accuracy difference from the best.')
+    parser.add_argument('--n_jobs', type=int, default=-1, help='no. jobs for tuning and training, -1 for all cores.')
 
     # tree/forest hyperparameters
     parser.add_argument('--n_estimators', type=int, default=100, help='number of trees in the forest.')
@@ -312,4 +396,16 @@ if __name__ == '__main__':
     parser.add_argument('--verbose', type=int, default=2, help='verbosity level.')
 
     args = parser.parse_args()
+
+    # sklearn only accepts max_samples when bootstrapping
+    if args.max_samples is not None:
+        if args.model != 'sklearn' or not args.bootstrap:
+            parser.error('--max_samples requires --model sklearn and --bootstrap.')
+        if not 0 < args.max_samples <= 1:
+            parser.error('--max_samples must be in (0, 1].')
+
+        # a full-size bootstrap is the default, and sklearn 0.24 rejects max_samples=1.0
+        if args.max_samples == 1:
+            args.max_samples = None
+
     main(args)
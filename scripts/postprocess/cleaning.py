@@ -2,15 +2,19 @@
 Organize results into a single CSV.
 """
 import os
+import re
 import sys
+import glob
+import json
 import argparse
 from datetime import datetime
 from itertools import product
 
 import numpy as np
 import pandas as pd
-from tqdm import tqdm
 from scipy.stats import sem
+from joblib import Parallel
+from joblib import delayed
 
 here = os.path.abspath(os.path.dirname(__file__))
 sys.path.insert(0, here + '/../')
@@ -23,57 +27,63 @@ def get_result(template, in_dir):
     """
     result = template.copy()
 
-    fp = os.path.join(in_dir, 'results.npy')
+    fp = os.path.join(in_dir, 'results.json')
+    npy_fp = os.path.join(in_dir, 'results.npy')
 
-    if not os.path.exists(fp):
-        result = None
+    if os.path.exists(fp):
+        with open(fp, 'r') as f:
+            d = json.load(f)
+        result.update(d)
 
-    else:
-        d = np.load(fp, allow_pickle=True)[()]
+    # results saved before the switch to JSON
+    elif os.path.exists(npy_fp):
+        d = np.load(npy_fp, allow_pickle=True)[()]
         result.update(d)
 
+    else:
+        result = None
+
     return result
 
 
-def process_results(df):
+def parse_result_path(experiment_dir, in_dir):
     """
-    Average results over different random states.
+    Extract the experiment setting from a results directory, None if malformed.
     """
-    groups = ['dataset', 'criterion', 'method']
+    rel_dir = os.path.relpath(experiment_dir, in_dir)
+    match = re.match(r'^([^/]+)/([^/]+)/([^/]+)/rs_(\d+)$', rel_dir.replace(os.sep, '/'))
 
-    main_result_list = []
+    if match is None:
+        return None
 
-    for tup, gf in tqdm(df.groupby(groups)):
-        main_result = {k: v for k, v in zip(groups, tup)}
-        main_result['auc_clean'] = gf['auc_clean'].mean()
-        main_result['acc_clean'] = gf['acc_clean'].mean()
-        main_result['ap_clean'] = gf['ap_clean'].mean()
-        main_result['num_runs'] = len(gf)
+    dataset, criterion, method, rs = match.groups()
+    return {'dataset': dataset, 'criterion': criterion, 'method': method, 'rs': int(rs)}
 
-        # aggregate list results
-        auc_list = []
-        acc_list = []
-        ap_list = []
-        checked_pct_list = []
-        for row in gf.itertuples(index=False):
-            auc_list.append(list(row.auc))
-            acc_list.append(list(row.acc))
-            ap_list.append(list(row.ap))
-            checked_pct_list.append(list(row.checked_pct))
 
-        main_result['auc'] = np.mean(auc_list, axis=0)
-        main_result['acc'] = np.mean(acc_list, axis=0)
-        main_result['ap'] = np.mean(ap_list, axis=0)
+def process_results(df):
+    """
+    Average results over different random states.
+    """
+    groups = ['dataset', 'criterion', 'method']
+    gf = df.groupby(groups)
 
-        main_result['auc_std'] = sem(auc_list, axis=0)
-        main_result['acc_std'] = sem(acc_list, axis=0)
-        main_result['ap_std'] = sem(ap_list, axis=0)
+    # scalar results, reduced in a single vectorized pass
+    main_df = gf.agg(auc_clean=('auc_clean', 'mean'),
+                     acc_clean=('acc_clean', 'mean'),
+                     ap_clean=('ap_clean', 'mean'),
+                     num_runs=('auc_clean', 'size'))
 
-        main_result['checked_pct'] = np.mean(checked_pct_list, axis=0)
+    # list results, stacked once per group and reduced element-wise
+    for col in ['auc', 'acc', 'ap', 'checked_pct']:
+        runs = gf[col].apply(lambda x: np.vstack(x.tolist()))
+        main_df[col] = runs.apply(lambda x: np.mean(x, axis=0))
 
-        main_result_list.append(main_result)
+        if col != 'checked_pct':
+            main_df['{}_std'.format(col)] = runs.apply(lambda x: sem(x, axis=0))
 
-    main_df = pd.DataFrame(main_result_list)
+    cols = ['auc_clean', 'acc_clean', 'ap_clean', 'num_runs', 'auc', 'acc', 'ap',
+            'auc_std', 'acc_std', 'ap_std', 'checked_pct']
+    main_df = main_df[cols].reset_index()
 
     return main_df
 
@@ -82,21 +92,20 @@ def create_csv(args, out_dir, logger):
 
     logger.info('\nGathering results...')
 
-    experiment_settings = list(product(*[args.dataset, args.criterion, args.method, args.rs]))
-
-    results = []
-    for dataset, criterion, method, rs in tqdm(experiment_settings):
-        template = {'dataset': dataset, 'criterion': criterion, 'method': method, 'rs': rs}
-        experiment_dir = os.path.join(args.in_dir, dataset, criterion, method, 'rs_{}'.format(rs))
+    # discover existing experiments with one directory listing instead of a stat per setting
+    experiment_settings = set(product(*[args.dataset, args.criterion, args.method, args.rs]))
+    pattern = os.path.join(args.in_dir, '*', '*', '*', 'rs_*')
 
-        # skip empty experiments
-        if not os.path.exists(experiment_dir):
-            continue
+    jobs = []
+    for experiment_dir in sorted(glob.glob(pattern)):
+        template = parse_result_path(experiment_dir, args.in_dir)
+        if template is not None and tuple(template.values()) in experiment_settings:
+            jobs.append((template, experiment_dir))
 
-        # add results to result dict
-        result = get_result(template, experiment_dir)
-        if result is not None:
-            results.append(result)
+    # load result files concurrently, threads suffice since loading is I/O-bound
+    results = Parallel(n_jobs=args.n_jobs, backend='threading')(
+        delayed(get_result)(template, experiment_dir) for template, experiment_dir in jobs)
+    results = [result for result in results if result is not None]
 
     pd.set_option('display.max_columns', 100)
     pd.set_option('display.width', 180)
@@ -138,6 +147,7 @@ if __name__ == '__main__':
     parser.add_argument('--criterion', type=str, nargs='+', default=['gini', 'entropy'], help='criterion.')
     parser.add_argument('--rs', type=int, nargs='+', default=[1, 2, 3, 4, 5], help='random state.')
     parser.add_argument('--method', type=str, nargs='+', default=['random', 'dart', 'dart_loss'], help='method.')
+    parser.add_argument('--n_jobs', type=int, default=-1, help='no. threads to load results with.')
 
     args = parser.parse_args()
     main(args)
@@ -3,6 +3,8 @@ Organize the performance results into a single csv.
 """
 import os
 import sys
+import glob
+import json
 import argparse
 from datetime import datetime
 from itertools import product
@@ -23,15 +25,22 @@ def get_result(template, in_dir):
     """
     result = template.copy()
 
-    fp = os.path.join(in_dir, 'results.npy')
+    fp = os.path.join(in_dir, 'results.json')
+    npy_fp = os.path.join(in_dir, 'results.npy')
 
-    if not os.path.exists(fp):
-        result = None
+    if os.path.exists(fp):
+        with open(fp, 'r') as f:
+            d = json.load(f)
+        result.update(d)
 
-    else:
-        d = np.load(fp, allow_pickle=True)[()]
+    # results saved before the switch to JSON
+    elif os.path.exists(npy_fp):
+        d = np.load(npy_fp, allow_pickle=True)[()]
         result.update(d)
 
+    else:
+        result = None
+
     return result
 
 
@@ -79,22 +88,40 @@ def process_results(df):
     Averages utility results over different random states.
     """
 
-    groups = ['dataset', 'criterion', 'model', 'bootstrap']
+    groups = ['dataset', 'criterion', 'model', 'bootstrap', 'max_samples']
 
-    main_result_list = []
+    utility_cols = ['acc_mean', 'acc_sem', 'auc_mean', 'auc_sem', 'ap_mean', 'ap_sem',
+                    'train_time_mean', 'train_time_std', 'k']
+    mode_cols = ['n_estimators', 'max_depth', 'max_features']
 
     df['max_features'] = df['max_features'].fillna(-1)
 
-    for tup, gf in tqdm(df.groupby(groups)):
-        main_result = {k: v for k, v in zip(groups, tup)}
-        main_result.update(process_utility(gf))
-        main_result['n_estimators'] = gf['n_estimators'].mode()[0]
-        main_result['max_depth'] = gf['max_depth'].mode()[0]
-        main_result['max_features'] = gf['max_features'].mode()[0]
-        main_result['num_runs'] = len(gf)
-        main_result_list.append(main_result)
+    # max_samples only applies to subsampled bootstraps, -1 groups all other runs
+    if 'max_samples' not in df:
+        df['max_samples'] = np.nan
+    df['max_samples'] = df['max_samples'].fillna(-1)
+    groupby = df.groupby(groups)
+    n_groups = groupby.ngroups
 
-    main_df = pd.DataFrame(main_result_list)
+    # preallocate one array per output column
+    out = {col: np.empty(n_groups, dtype=object) for col in groups}
+    out.update({col: np.empty(n_groups, dtype=np.float64) for col in utility_cols})
+    out.update({col: np.empty(n_groups, dtype=object) for col in mode_cols})
+    out['num_runs'] = np.empty(n_groups, dtype=np.int64)
+
+    for i, (tup, gf) in enumerate(tqdm(groupby, total=n_groups)):
+        for col, v in zip(groups, tup):
+            out[col][i] = v
+
+        for col, v in process_utility(gf).items():
+            out[col][i] = v
+
+        for col in mode_cols:
+            out[col][i] = gf[col].mode()[0]
+
+        out['num_runs'][i] = len(gf)
+
+    main_df = pd.DataFrame(out)
 
     return main_df
 
@@ -129,6 +156,12 @@ def create_csv(args, out_dir, logger):
             if bootstrap_result is not None:
                 results.append(bootstrap_result)
 
+            # add bootstrap results with subsampling
+            for max_samples_dir in sorted(glob.glob(os.path.join(bootstrap_dir, 'max_samples_*'))):
+                max_samples_result = get_result(template, max_samples_dir)
+                if max_samples_result is not None:
+                    results.append(max_samples_result)
+
             # add continuous result
             continuous_dir = os.path.join(args.in_dir, dataset, criterion,
                                           'continuous', tuning,
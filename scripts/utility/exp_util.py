@@ -1,6 +1,7 @@
 """
 Utility methods to make epxeriments easier.
 """
+import json
 import time
 
 import numpy as np
@@ -177,3 +178,24 @@ def get_random_state(seed):
     """
     np.random.seed(seed)
     return np.random.randint(MAX_INT)
+
+
+def _to_json(v):
+    """
+    Convert numpy scalars and arrays into JSON-serializable Python types.
+    """
+    if isinstance(v, np.generic):
+        return v.item()
+
+    elif isinstance(v, np.ndarray):
+        return v.tolist()
+
+    raise TypeError('object of type {} is not JSON serializable'.format(type(v).__name__))
+
+
+def save_results(results, fp):
+    """
+    Save a results dict as JSON, converting numpy values to Python types.
+    """
+    with open(fp, 'w') as f:
+        json.dump(results, f, default=_to_json)